@@ -32,12 +32,12 @@ export const fetchHints =
       },
     } = getState();
 
-    const { status } = await api.Post<T.WordHint[]>(
-      "",
-      { corpus, limit, query },
+    // the GET form of the query is cached by the browser and proxies
+    const { status } = await api.Get<T.WordHintColumns>(
+      `?${hintQueryString(corpus, limit, query)}`,
       {
         beforeRequest: () => dispatch(A.fetchHints.request()),
-        onSuccess: (data) => dispatch(A.fetchHints.success(data)),
+        onSuccess: (data) => dispatch(A.fetchHints.success(fromColumns(data))),
         onError: (e) => {
           notifyOnApiError(e);
           dispatch(A.fetchHints.failure());
@@ -46,3 +46,61 @@ export const fetchHints =
     );
     return status === 200;
   };
+
+// canonical query string of the GET hint query, it must match HintQuery.canonical_query of the api server
+// or the server redirects to the canonical one
+const hintQueryString = (
+  corpus: string,
+  limit: number | undefined,
+  query: T.WordHintQuery[]
+) => {
+  const positions = (p: number[]) =>
+    Array.from(new Set(p)).sort((a, b) => a - b);
+  const filters = query.map(
+    ({ letter, positions: fixed, exclude_positions, atLeast, atMost }) =>
+      [
+        letter.toLowerCase(),
+        positions(fixed),
+        positions(exclude_positions),
+        atLeast,
+        atMost,
+      ] as const
+  );
+  // same order as the server's sorted tuples
+  filters.sort(
+    (a, b) =>
+      (a[0] !== b[0] ? (a[0] < b[0] ? -1 : 1) : 0) ||
+      compareArrays(a[1], b[1]) ||
+      compareArrays(a[2], b[2]) ||
+      a[3] - b[3] ||
+      a[4] - b[4]
+  );
+
+  const params = [`corpus=${encodeURIComponent(corpus)}`];
+  if (limit != null) params.push(`limit=${limit}`);
+  params.push("format=columns");
+  filters.forEach(([letter, fixed, excluded, atLeast, atMost]) =>
+    params.push(
+      `q=${letter}.${fixed.join("_")}.${excluded.join("_")}.${atLeast}.${atMost}`
+    )
+  );
+  return params.join("&");
+};
+
+const compareArrays = (a: readonly number[], b: readonly number[]) => {
+  for (let i = 0; i < Math.min(a.length, b.length); i++) {
+    if (a[i] !== b[i]) return a[i] - b[i];
+  }
+  return a.length - b.length;
+};
+
+const fromColumns = ({
+  word,
+  partition,
+  frequency,
+}: T.WordHintColumns): T.WordHint[] =>
+  word.map((w, i) => ({
+    word: w,
+    partition: partition[i],
+    frequency: frequency[i],
+  }));
@@ -20,6 +20,13 @@ export type WordHint = {
   frequency: number;
 };
 
+// hints as returned by the api with format "columns", the i-th hint is made of the i-th item of each column
+export type WordHintColumns = {
+  word: string[];
+  partition: number[];
+  frequency: number[];
+};
+
 export type WordHintQuery = {
   letter: string;
   positions: number[]; // fixed position
@@ -0,0 +1,122 @@
+import pickle
+import random
+from pathlib import Path
+
+import pandas as pd
+
+from corpus.feedback import feedback_filters, score_guess
+
+# letters weighted roughly like English so that filters have realistic selectivity
+LETTERS = 'EEEEEEAAAAARRRRIIIIOOOOTTTTNNNSSSLLLCCUUDDPPMMHHGBFYWKVXZJQ'
+
+
+def synthetic_words(n: int, seed: int = 0, min_length: int = 3, max_length: int = 8) -> set[str]:
+    """Generates n distinct upper-cased pseudo words with lengths in [min_length, max_length]"""
+    rng = random.Random(seed)
+    words = set()
+    while len(words) < n:
+        words.add(''.join(rng.choice(LETTERS) for _ in range(rng.randint(min_length, max_length))))
+    return words
+
+
+def write_fixture(folder: Path, sources: dict[str, set[str]], seed: int = 0):
+    """
+    Writes source word lists and a word frequency table into a WORDLE_FOLDER so that CorpusFactory can
+    build corpora without network access
+    """
+    rng = random.Random(seed)
+    root = Path(folder) / '.wordle'
+
+    all_words = set()
+    for source, words in sources.items():
+        (root / source).mkdir(parents=True, exist_ok=True)
+        with open(root / source / 'source.p', 'wb') as f:
+            pickle.dump(words, f)
+        all_words |= words
+
+    # only some words have a frequency, like the real frequency table
+    frequent = sorted(w.lower() for w in all_words if rng.random() < 0.6)
+    (pd.DataFrame({'word': frequent, 'frequency': [rng.randint(1, 1_000_000) for _ in frequent]})
+     .sort_values('frequency', ascending=False)
+     .reset_index(drop=True)
+     .to_pickle(root / 'word_frequency.p'))
+
+
+def simulate_game(words: list[str], rng: random.Random, max_guesses: int = 6, answer: str = None, opener: str = None):
+    """
+    Plays a game with random guesses among the remaining candidates, starting with the opener if given.
+    Returns the (guess, pattern) rows
+    """
+    answer = answer or rng.choice(words)
+    candidates = words
+    rows = []
+
+    for i in range(max_guesses):
+        guess = opener if i == 0 and opener else rng.choice(candidates)
+        pattern = score_guess(guess, answer)
+        rows.append((guess, pattern))
+        if guess == answer:
+            break
+
+        candidates = [w for w in candidates if score_guess(guess, w) == pattern]
+
+    return rows
+
+
+def filter_mixes(words: list[str], word_length: int, n: int = 50, seed: int = 0):
+    """
+    Representative filter lists keyed by name: the empty query, 1 to 5 guesses into simulated games,
+    guesses with repeated letters and guesses where most letters are grey
+    """
+    rng = random.Random(seed)
+    mixes = {'empty': [[]]}
+
+    games = [simulate_game(words, rng) for _ in range(n)]
+    for i in range(1, 6):
+        mixes[f'{i}_guess'] = [feedback_filters(g[:i], word_length) for g in games if len(g) >= i]
+
+    repeated = [w for w in words if len(set(w)) < word_length]
+    mixes['repeated_letters'] = []
+    for _ in range(n):
+        guess = rng.choice(repeated)
+        mixes['repeated_letters'].append(feedback_filters([(guess, score_guess(guess, rng.choice(words)))], word_length))
+
+    mixes['heavy_exclusions'] = []
+    for _ in range(n):
+        answer = rng.choice(words)
+        disjoint = [w for w in rng.sample(words, min(len(words), 500)) if not set(w) & set(answer)]
+        guesses = (disjoint + rng.sample(words, 3))[:3]
+        mixes['heavy_exclusions'].append(feedback_filters([(g, score_guess(g, answer)) for g in guesses], word_length))
+
+    return mixes
+
+
+def random_filters(words: list[str], word_length: int, n: int = 500, seed: int = 0):
+    """
+    Random filter lists that are not limited to the states of a game: fixed, excluded and grey letters, letter
+    count ranges, several filters for the same letter and contradictory filters
+    """
+    from corpus import WordFilter
+
+    rng = random.Random(seed)
+    filter_lists = []
+    for _ in range(n):
+        filters = []
+        word = rng.choice(words)
+        for _ in range(rng.randint(1, 5)):
+            # letters of a real word keep most lists satisfiable, random letters add misses and contradictions
+            letter = rng.choice(word) if rng.random() < 0.7 else rng.choice(LETTERS)
+            position = rng.randint(1, word_length)
+            kind = rng.random()
+            if kind < 0.3:
+                filters.append(WordFilter(letter, [position], [], 1, word_length))
+            elif kind < 0.6:
+                at_least = rng.randint(1, 2)
+                filters.append(WordFilter(letter, [], [position], at_least, rng.randint(at_least, word_length)))
+            elif kind < 0.85:
+                filters.append(WordFilter(letter, [], [], 0, 0))
+            else:
+                count = rng.randint(1, 3)
+                filters.append(WordFilter(letter, [], [], count, count))
+        filter_lists.append(filters)
+    return filter_lists
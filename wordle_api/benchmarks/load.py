@@ -0,0 +1,307 @@
+"""
+Load test of the hint API. Multi-guess game traces are simulated offline against a synthetic corpus and replayed
+by concurrent virtual players against `api_server:app` started with uvicorn, for each number of uvicorn workers
+and each concurrency level. Throughput and latency percentiles of /api/hint are reported as JSON.
+
+Each player replays games one after the other and asks for hints before its first guess and after every guess,
+like the web client. The load generator is a single asyncio loop with keep-alive connections, it needs a CPU of
+its own to not become the bottleneck.
+
+Usage (from the wordle_api folder)
+
+    python -m benchmarks.load                                    # 1 worker, concurrency 1, 8 and 32
+    python -m benchmarks.load --workers 1,2,4 --concurrency 16,64
+    python -m benchmarks.load --mode post --duration 30          # the POST query instead of the cacheable GET
+    python -m benchmarks.load --output load.json                 # also write the results as JSON
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from pathlib import Path
+
+MODES = ('get', 'post', 'session')
+OPENERS = ('SLATE', 'CRANE', 'ADIEU', 'RAISE', 'STARE')
+
+
+def generate_traces(words: list[str], n_games: int, word_length: int, opener_share: float, seed: int = 0):
+    """
+    Simulates games and returns the hint queries of each game: the empty query, then the query after each
+    guess. Each query is given by all the filters of the game so far and by the filters of its last guess only,
+    which are sent with the session token of the previous query. A share of the games starts with one of the
+    popular openers
+    """
+    from corpus.feedback import feedback_filters
+    from .fixtures import simulate_game
+
+    rng = random.Random(seed)
+    openers = [w for w in OPENERS if len(w) == word_length]
+    traces = []
+    for _ in range(n_games):
+        opener = rng.choice(openers) if openers and rng.random() < opener_share else None
+        rows = simulate_game(words, rng, opener=opener)
+        traces.append([(feedback_filters(rows[:i], word_length), feedback_filters(rows[i - 1:i], word_length))
+                       for i in range(len(rows) + 1)])
+    return traces
+
+
+def encode_requests(traces: list, corpus: str, word_length: int, limit: int | None, mode: str):
+    """
+    Encodes each query as (method, target, body, session body) once, so that replaying costs no encoding. The
+    session body, sent with the token of the previous query in 'session' mode, only has the last guess' filters
+    """
+    from server.routers.hint.models import HintQuery
+
+    def hint_query(filters: list):
+        return HintQuery(corpus=corpus, word_length=word_length, limit=limit, format='columns',
+                         query=[{'letter': f.letter.lower(), 'positions': f.positions,
+                                 'exclude_positions': f.exclude_positions,
+                                 'at_least': f.at_least, 'at_most': f.at_most} for f in filters])
+
+    def body(query: HintQuery):
+        return {'corpus': corpus, 'wordLength': word_length, 'limit': limit, 'format': 'columns',
+                'query': [{'letter': x.letter, 'positions': x.positions, 'excludePositions': x.exclude_positions,
+                           'atLeast': x.at_least, 'atMost': x.at_most} for x in query.query]}
+
+    encoded = []
+    for trace in traces:
+        game = []
+        for filters, new_filters in trace:
+            query = hint_query(filters)
+            if mode == 'get':
+                game.append(('GET', f"/api/hint/?{query.canonical_query()}", None, None))
+            else:
+                game.append(('POST', '/api/hint/', body(query), body(hint_query(new_filters))))
+        encoded.append(game)
+    return encoded
+
+
+class Connection:
+    def __init__(self, host: str, port: int, accept_encoding: str):
+        """Minimal HTTP/1.1 keep-alive client, enough for the API's responses"""
+        self.host = host
+        self.port = port
+        self.accept_encoding = accept_encoding
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def request(self, method: str, target: str, body: dict = None, headers: dict[str, str] = None):
+        """Sends the request and reads the whole response. Returns the status and the response headers"""
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+
+        lines = [f"{method} {target} HTTP/1.1", f"Host: {self.host}:{self.port}",
+                 f"Accept-Encoding: {self.accept_encoding}"]
+        lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+        payload = b''
+        if body is not None:
+            payload = json.dumps(body).encode()
+            lines += ["Content-Type: application/json", f"Content-Length: {len(payload)}"]
+        self.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode() + payload)
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while (line := await self.reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip()
+
+        if 'content-length' in response_headers:
+            await self.reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding') == 'chunked':
+            while size := int((await self.reader.readline()).strip(), 16):
+                await self.reader.readexactly(size + 2)
+            await self.reader.readline()
+
+        if response_headers.get('connection') == 'close':
+            self.close()
+        return status, response_headers
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.reader = self.writer = None
+
+
+async def replay(port: int, games: list, concurrency: int, duration: float, warmup: float, mode: str,
+                 accept_encoding: str):
+    """
+    Replays the games with concurrent players for warmup + duration seconds. Only the requests that start after
+    the warmup are measured
+
+    :return: latencies in seconds of the measured successful requests, status counts and the measured time
+    """
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    measure_from, stop_at = start + warmup, start + warmup + duration
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+
+    async def player(i: int):
+        connection = Connection('127.0.0.1', port, accept_encoding)
+        try:
+            # players start at different games so that they do not ask for the same hints in lockstep
+            g = i * len(games) // concurrency
+            while loop.time() < stop_at:
+                token = None
+                for method, target, body, session_body in games[g % len(games)]:
+                    if loop.time() >= stop_at:
+                        break
+                    # with a token, only the filters of the new guess narrow the candidates of the session
+                    if mode == 'session' and token is not None:
+                        body = {**session_body, 'token': token}
+
+                    sent = loop.time()
+                    try:
+                        status, headers = await connection.request(method, target, body)
+                    except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                        connection.close()
+                        status, headers = 'connection_error', {}
+                    elapsed = loop.time() - sent
+
+                    if sent >= measure_from:
+                        statuses[str(status)] = statuses.get(str(status), 0) + 1
+                        if status == 200:
+                            latencies.append(elapsed)
+                    token = headers.get('x-hint-token')
+                g += 1
+        finally:
+            connection.close()
+
+    await asyncio.gather(*(player(i) for i in range(concurrency)))
+    return latencies, statuses, loop.time() - measure_from
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(env: dict[str, str], workers: int, timeout: float = 120):
+    """Starts uvicorn and waits until every worker reports healthy"""
+    port = free_port()
+    process = subprocess.Popen([sys.executable, '-m', 'uvicorn', 'api_server:app', '--host', '127.0.0.1',
+                                '--port', str(port), '--workers', str(workers), '--log-level', 'warning'],
+                               env=env, cwd=Path(__file__).parents[1])
+
+    deadline = time.monotonic() + timeout
+    healthy = 0
+    # requests are spread over the workers, consecutive successes make it likely that every worker is ready
+    while healthy < 4 * workers:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with code {process.returncode}")
+        if time.monotonic() > deadline:
+            stop_server(process)
+            raise RuntimeError(f"uvicorn was not healthy after {timeout}s")
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/_healthcheck", timeout=5) as resp:
+                healthy = healthy + 1 if resp.status == 200 else 0
+        except OSError:
+            healthy = 0
+            time.sleep(0.2)
+
+    return process, port
+
+
+def stop_server(process: subprocess.Popen):
+    process.terminate()
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def summarize_level(latencies: list[float], statuses: dict[str, int], elapsed: float):
+    from .run import summarize
+
+    latency = {k: v for k, v in summarize(latencies, 0).items() if k != 'peak_kib'} if latencies else {}
+    return {
+        'requests': sum(statuses.values()),
+        'errors': sum(n for status, n in statuses.items() if status != '200'),
+        'statuses': statuses,
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        'latency': latency,
+    }
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Load tests the hint API with replayed game traces")
+    parser.add_argument('--workers', default='1', help="comma separated numbers of uvicorn workers")
+    parser.add_argument('--concurrency', default='1,8,32', help="comma separated numbers of concurrent players")
+    parser.add_argument('--duration', type=float, default=10, help="measured seconds per concurrency level")
+    parser.add_argument('--warmup', type=float, default=2, help="unmeasured seconds before each level")
+    parser.add_argument('--mode', choices=MODES, default='get',
+                        help="'get' sends the cacheable GET query like the web client, 'post' the POST query and "
+                             "'session' the filters of the last guess with the session token of the previous query")
+    parser.add_argument('--games', type=int, default=500, help="number of simulated games")
+    parser.add_argument('--opener-share', type=float, default=0.5, help="share of games starting with a popular opener")
+    parser.add_argument('--words', type=int, default=60_000, help="number of synthetic source words per source")
+    parser.add_argument('--corpus', default='web2', help="corpus the players query")
+    parser.add_argument('--limit', type=int, default=20, help="hints per query, 0 for all of them")
+    parser.add_argument('--accept-encoding', default='gzip', help="Accept-Encoding header of the requests")
+    parser.add_argument('--executor', default=os.getenv('WORDLE_EXECUTOR', 'thread'), help="WORDLE_EXECUTOR of the server")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', type=Path, help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    workers = [int(n) for n in args.workers.split(',')]
+    levels = [int(n) for n in args.concurrency.split(',')]
+    limit = args.limit or None
+    word_length = 5
+
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['WORDLE_FOLDER'] = folder
+        from corpus import CorpusFactory
+        from .startup import build_fixture
+
+        build_fixture(folder, args.words, [word_length])
+        factory = CorpusFactory(word_length, engine='bitset')
+        factory.create_opening_books(OPENERS)
+
+        words = sorted(factory.get_corpus(args.corpus).words)
+        traces = generate_traces(words, args.games, word_length, args.opener_share, args.seed)
+        games = encode_requests(traces, args.corpus, word_length, limit, args.mode)
+
+        env = {**os.environ, 'WORDLE_FOLDER': folder, 'WORDLE_PRELOAD': args.corpus,
+               'WORDLE_EXECUTOR': args.executor, 'WORDLE_OPENERS': ','.join(OPENERS)}
+        results = []
+        for n_workers in workers:
+            process, port = start_server(env, n_workers)
+            try:
+                for concurrency in levels:
+                    latencies, statuses, elapsed = asyncio.run(
+                        replay(port, games, concurrency, args.duration, args.warmup, args.mode, args.accept_encoding))
+                    result = {'workers': n_workers, 'concurrency': concurrency,
+                              **summarize_level(latencies, statuses, elapsed)}
+                    results.append(result)
+                    print(f"workers={n_workers:<3} concurrency={concurrency:<4} {result['throughput_rps']:>9.1f} req/s  "
+                          f"p50={result['latency'].get('p50_ms', 0):.2f}ms  p95={result['latency'].get('p95_ms', 0):.2f}ms  "
+                          f"p99={result['latency'].get('p99_ms', 0):.2f}ms  errors={result['errors']}", file=sys.stderr)
+            finally:
+                stop_server(process)
+
+    report = {
+        'config': {'mode': args.mode, 'corpus': args.corpus, 'limit': limit, 'games': args.games,
+                   'queries': sum(len(g) for g in games), 'opener_share': args.opener_share, 'words': args.words,
+                   'duration_s': args.duration, 'warmup_s': args.warmup, 'executor': args.executor,
+                   'accept_encoding': args.accept_encoding, 'seed': args.seed},
+        'machine': {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()},
+        'results': results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+"""
+Benchmarks for the corpus filter and ranking hot paths. Runs offline on synthetic word lists.
+
+Usage (from the wordle_api folder)
+
+    python -m benchmarks.run                     # run and compare against benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline     # run and store the results as the new baseline
+    python -m benchmarks.run --output out.json   # also write the results as JSON
+
+Before timing anything, the 'set' and 'bitset' engines are checked to give the same candidates and the same
+ranking over random filter lists.
+
+The exit code is 1 when the engines disagree or when a benchmark's p50 latency is slower than the baseline by more
+than the tolerance.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable
+
+BASELINE = Path(__file__).parent / 'baseline.json'
+
+
+def measure(func: Callable, repeat: int, setup: Callable = None):
+    """Times `repeat` calls of func and measures the peak memory of one extra call"""
+    latencies = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - start)
+
+    if setup is not None:
+        setup()
+    gc.collect()
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return summarize(latencies, peak)
+
+
+def summarize(latencies: list[float], peak: int):
+    ms = sorted(x * 1000 for x in latencies)
+    q = statistics.quantiles(ms, n=100, method='inclusive') if len(ms) > 1 else ms * 99
+    return {
+        'n': len(ms),
+        'p50_ms': round(q[49], 4),
+        'p95_ms': round(q[94], 4),
+        'p99_ms': round(q[98], 4),
+        'max_ms': round(ms[-1], 4),
+        'peak_kib': round(peak / 1024, 1),
+    }
+
+
+def check_parity(set_corpus, bitset_corpus, ranker, filter_lists: list) -> list[str]:
+    """
+    Compares the 'set' and 'bitset' engine corpora of a source on each filter list: the candidate words of
+    `get_potential_words` with the ids of `get_potential_word_ids`, and the ranking of the candidates by the
+    set based `WordRanker.partition_score` with the array based `WordRanker.rank`. Records with the same
+    frequency and partition score may be ordered differently, so the records are compared as sets and the
+    ranking by its sequence of (frequency, partition) keys
+
+    :return: a description of each filter list where the engines disagree
+    """
+    mismatches = []
+    for filters in filter_lists:
+        words = set_corpus.get_potential_words(filters)
+        ids = bitset_corpus.get_potential_word_ids(filters)
+
+        described = [f.canonical() for f in filters]
+        if set(bitset_corpus.index.words_of(ids)) != words:
+            mismatches.append(f"candidates differ for {described}: {len(words)} words with 'set', {len(ids)} with 'bitset'")
+            continue
+        if not words:
+            continue
+
+        expected = ranker.partition_score(words).to_dict('records')
+        ranked = ranker.rank(bitset_corpus, ids)
+        if (sorted(map(_record_key, expected)) != sorted(map(_record_key, ranked))
+                or [_rank_key(r) for r in expected] != [_rank_key(r) for r in ranked]):
+            mismatches.append(f"ranking differs for {described}")
+
+    return mismatches
+
+
+def _record_key(record: dict):
+    return record['word'], int(record['partition']), int(record['frequency'])
+
+
+def _rank_key(record: dict):
+    return int(record['frequency']), int(record['partition'])
+
+
+def run_benchmarks(n_words: int, repeat: int, word_length: int = 5):
+    """
+    Runs the benchmarks on a synthetic corpus of n_words source words
+
+    :return: the results keyed by benchmark name and the engine mismatches found by `check_parity`
+    """
+    from corpus import CorpusFactory, WordCorpus, WordRanker
+    from .fixtures import filter_mixes, random_filters, synthetic_words, write_fixture
+
+    results = {}
+    source_words = synthetic_words(n_words)
+
+    with tempfile.TemporaryDirectory() as folder:
+        os.environ['WORDLE_FOLDER'] = folder
+        write_fixture(folder, {'web2': source_words})
+
+        factory = CorpusFactory(word_length, engine='bitset')
+        frequencies = factory.get_word_frequencies()
+
+        for engine in ('set', 'bitset'):
+            results[f'build/{engine}'] = measure(
+                lambda: WordCorpus(source_words, 'web2', word_length, engine, frequencies), max(3, repeat // 20))
+
+        factory.create_corpus('web2')
+
+        def clear_instances():
+            CorpusFactory.__corpus_instances__.clear()
+            CorpusFactory.__word_tables__.clear()
+
+        results['load/get_corpus'] = measure(lambda: factory.get_corpus('web2'), repeat, setup=clear_instances)
+
+        corpus = factory.get_corpus('web2')
+        words = sorted(corpus.words)
+        mixes = filter_mixes(words, word_length)
+        ranker = WordRanker(word_length, factory.get_word_frequency_table())
+
+        # the factory caches a corpus per engine, so the engines are compared without changing a shared corpus
+        engines = {'set': CorpusFactory(word_length, engine='set').get_corpus('web2'), 'bitset': corpus}
+
+        parity = [filters for filter_lists in mixes.values() for filters in filter_lists]
+        mismatches = check_parity(engines['set'], corpus, ranker, parity + random_filters(words, word_length))
+
+        for engine, engine_corpus in engines.items():
+            for name, filter_lists in mixes.items():
+                calls = iter(filter_lists * (repeat // len(filter_lists) + 1))
+                results[f'filter/{engine}/{name}'] = measure(
+                    lambda: engine_corpus.get_potential_words(next(calls)), repeat)
+
+        ids = corpus.get_potential_word_ids([])
+        for size in (100, 1_000, 10_000, len(ids)):
+            if size > len(ids):
+                continue
+
+            subset = ids[::max(1, len(ids) // size)][:size]
+            subset_words = set(corpus.index.words_of(subset))
+            reps = max(3, repeat // 10) if size > 1_000 else repeat
+            results[f'rank/partition_score/{size}'] = measure(lambda: ranker.partition_score(subset_words), reps)
+            results[f'rank/rank/{size}'] = measure(lambda: ranker.rank(corpus, subset), reps)
+            results[f'rank/rank_top50/{size}'] = measure(lambda: ranker.rank(corpus, subset, 50), reps)
+
+        clear_instances()
+
+    return results, mismatches
+
+
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Prints the results next to the baseline. Returns the names of the regressed benchmarks"""
+    regressions = []
+    print(f"{'benchmark':<40} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'peak KiB':>10} {'vs base':>8}")
+    for name, r in results.items():
+        ratio = ''
+        if (b := baseline.get(name)) is not None and b['p50_ms'] > 0:
+            change = r['p50_ms'] / b['p50_ms']
+            ratio = f"{change:.2f}x"
+            if change > tolerance:
+                regressions.append(name)
+                ratio += ' !'
+        print(f"{name:<40} {r['p50_ms']:>10.3f} {r['p95_ms']:>10.3f} {r['p99_ms']:>10.3f} {r['peak_kib']:>10.1f} {ratio:>8}")
+
+    return regressions
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Benchmarks the corpus filter and ranking hot paths")
+    parser.add_argument('--words', type=int, default=60_000, help="number of synthetic source words")
+    parser.add_argument('--repeat', type=int, default=200, help="calls per benchmark")
+    parser.add_argument('--baseline', type=Path, default=BASELINE, help="baseline results file")
+    parser.add_argument('--save-baseline', action='store_true', help="store the results as the baseline")
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help="p50 ratio over the baseline that counts as a regression")
+    parser.add_argument('--output', type=Path, help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    results, mismatches = run_benchmarks(args.words, args.repeat)
+    report = {
+        'config': {'words': args.words, 'repeat': args.repeat},
+        'machine': {'python': platform.python_version(), 'platform': platform.platform()},
+        'results': results,
+    }
+
+    baseline = {}
+    if args.baseline.exists():
+        stored = json.loads(args.baseline.read_text())
+        if stored['config'] == report['config']:
+            baseline = stored['results']
+        else:
+            print(f"baseline config {stored['config']} differs from {report['config']}, not comparing")
+
+    regressions = compare(results, baseline, args.tolerance)
+    for mismatch in mismatches:
+        print(f"engine mismatch: {mismatch}")
+
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2))
+        print(f"saved baseline to {args.baseline}")
+    elif regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.tolerance}x: {', '.join(regressions)}")
+        return 1
+
+    if mismatches:
+        print(f"the 'set' and 'bitset' engines disagree on {len(mismatches)} filter list(s)")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,103 @@
+"""
+Measures the cold start of an API server worker: the time to import the app, the time to preload the corpora
+and the memory of the process afterwards. Every run starts a fresh interpreter, like a new replica or worker.
+
+Usage (from the wordle_api folder)
+
+    python -m benchmarks.startup                     # synthetic corpora in a temporary WORDLE_FOLDER
+    python -m benchmarks.startup --folder /app       # the prebuilt corpora of an existing WORDLE_FOLDER
+    python -m benchmarks.startup --output out.json   # also write the results as JSON
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# modules only needed to build corpora, the server must start without them
+BUILD_MODULES = ('pandas', 'requests', 'tqdm')
+
+WORKER = f"""
+import json, sys, time
+start = time.perf_counter()
+import api_server
+imported = time.perf_counter()
+from server.routers.hint.constants import FACTORY, PRELOAD
+FACTORY.preload(PRELOAD)
+loaded = time.perf_counter()
+from benchmarks.startup import memory
+print(json.dumps({{'import_s': imported - start, 'preload_s': loaded - imported, **memory(),
+                  'build_modules': [m for m in {BUILD_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def memory():
+    """Resident (RSS), peak resident and proportional (PSS, shared pages split between processes) memory in MiB"""
+    usage = {}
+    for path, fields in (('/proc/self/status', {'VmRSS': 'rss_mib', 'VmHWM': 'peak_rss_mib'}),
+                         ('/proc/self/smaps_rollup', {'Pss': 'pss_mib'})):
+        try:
+            with open(path) as f:
+                for line in f:
+                    name, _, value = line.partition(':')
+                    if name in fields:
+                        usage[fields[name]] = round(int(value.split()[0]) / 1024, 1)
+        except OSError:
+            pass
+    return usage
+
+
+def measure_worker(env: dict[str, str]):
+    start = time.perf_counter()
+    out = subprocess.run([sys.executable, '-c', WORKER], env=env, cwd=Path(__file__).parents[1],
+                         capture_output=True, text=True, check=True)
+    return {'process_s': time.perf_counter() - start, **json.loads(out.stdout.splitlines()[-1])}
+
+
+def build_fixture(folder: str, n_words: int, word_lengths: list[int]):
+    """Writes synthetic sources into the folder and builds their word tables"""
+    from corpus import CorpusFactory
+    from .fixtures import synthetic_words, write_fixture
+
+    write_fixture(folder, {'web2': synthetic_words(n_words, seed=0), 'coca': synthetic_words(n_words, seed=1)})
+    CorpusFactory(word_lengths).create_corpora()
+
+
+def main(argv: list[str] = None):
+    parser = argparse.ArgumentParser(description="Measures the cold start time and memory of an API server worker")
+    parser.add_argument('--folder', type=Path, help="WORDLE_FOLDER with prebuilt corpora. Uses synthetic corpora if not given")
+    parser.add_argument('--words', type=int, default=60_000, help="number of synthetic source words per source")
+    parser.add_argument('--repeat', type=int, default=5, help="number of cold starts")
+    parser.add_argument('--output', type=Path, help="write the results to this JSON file")
+    args = parser.parse_args(argv)
+
+    word_lengths = os.getenv('WORDLE_WORD_LENGTHS', '5')
+    with tempfile.TemporaryDirectory() as tmp:
+        folder = str(args.folder or tmp)
+        env = {**os.environ, 'WORDLE_FOLDER': folder, 'WORDLE_WORD_LENGTHS': word_lengths}
+        if args.folder is None:
+            os.environ['WORDLE_FOLDER'] = folder
+            build_fixture(folder, args.words, [int(n) for n in word_lengths.split(',')])
+            env['WORDLE_PRELOAD'] = 'web2,coca'
+
+        runs = [measure_worker(env) for _ in range(args.repeat)]
+
+    report = {name: round(statistics.median(r[name] for r in runs), 4)
+              for name in runs[0] if name != 'build_modules'}
+    report['build_modules'] = sorted({m for r in runs for m in r['build_modules']})
+    report['runs'] = args.repeat
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    # the serving path must not import the build dependencies
+    return 1 if report['build_modules'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,3 +1,4 @@
+from .cache import ResultCache
 from .corpus import WordCorpus, WordFilter
 from .factory import CorpusFactory
 from .rankers import WordRanker
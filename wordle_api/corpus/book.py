@@ -0,0 +1,122 @@
+from functools import lru_cache
+from itertools import product
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from .corpus import WordFilter
+from .feedback import feedback_filters
+from .storage import load_arrays, save_arrays
+
+if TYPE_CHECKING:
+    from .corpus import WordCorpus
+    from .rankers import WordRanker
+
+
+class OpeningBook:
+    def __init__(self, openers: list[str], word_length: int, ranked: np.ndarray, partition: np.ndarray,
+                 offsets: np.ndarray, version: str = None):
+        """
+        Ranked candidates of every state after a single guess with one of the openers, that is for every
+        opener and each of its 3 ** word_length feedback patterns. Create it with `OpeningBook.build`.
+
+        The candidates of state i are `ranked[offsets[i]:offsets[i + 1]]`, ranked like `WordRanker.rank_columns`
+        with their partition scores in `partition`. As ranking a prefix gives the top k of the candidates,
+        queries with any limit are answered by slicing
+
+        :param openers: upper-cased opening words
+        :param word_length: length of the words
+        :param ranked: ids in the corpus' index of the ranked candidates of every state, one after the other
+        :param partition: partition score of each ranked candidate
+        :param offsets: start of the candidates of each state in `ranked`, followed by the total
+        :param version: build version of the corpus data, the ids are only valid for that version
+        """
+        self.openers = openers
+        self.word_length = word_length
+        self.ranked = ranked
+        self.partition = partition
+        self.offsets = offsets
+        self.version = version
+
+        self._states = _state_keys(tuple(openers), word_length)
+
+    @staticmethod
+    def _iter_states(openers: list[str], word_length: int):
+        for opener in openers:
+            for pattern in product(range(3), repeat=word_length):
+                # the first letter varies fastest, as in `corpus.feedback.encode_pattern`
+                yield opener, pattern[::-1]
+
+    @classmethod
+    def build(cls, corpus: 'WordCorpus', ranker: 'WordRanker', openers: list[str]):
+        """
+        Filters and ranks the candidates of every state of the openers
+
+        :param corpus: a corpus using the 'bitset' engine
+        :param ranker: the ranker of the hints
+        :param openers: opening words of the corpus' word length
+
+        Examples
+        --------
+        >>> from corpus import CorpusFactory, WordRanker
+        >>> from corpus.book import OpeningBook
+        >>> corpus = CorpusFactory(5, engine='bitset').get_corpus('web2')
+        >>> book = OpeningBook.build(corpus, WordRanker(5), ['SLATE'])  # doctest: +SKIP
+        """
+        openers = [w.upper() for w in openers]
+        if not openers:
+            raise ValueError("an opening book needs at least one opener")
+        if invalid := [w for w in openers if len(w) != corpus.word_length]:
+            raise ValueError(f"opener '{invalid[0]}' is not a {corpus.word_length} letter word")
+
+        ranked, partition, offsets = [], [], [0]
+        for opener, pattern in cls._iter_states(openers, corpus.word_length):
+            ids = corpus.get_potential_word_ids(feedback_filters([(opener, pattern)], corpus.word_length))
+            order, scores, _ = ranker.rank_ids(corpus, ids)
+            ranked.append(order)
+            partition.append(scores)
+            offsets.append(offsets[-1] + len(ids))
+
+        return cls(openers, corpus.word_length,
+                   np.concatenate(ranked).astype(np.int32),
+                   np.concatenate(partition).astype(np.int32),
+                   np.array(offsets, dtype=np.int64),
+                   corpus.version)
+
+    def lookup(self, filters: list[WordFilter]) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        Ranked candidate ids and their partition scores if the filters are the state after one of the openers,
+        as built by `corpus.feedback.feedback_filters`. None otherwise
+        """
+        i = self._states.get(tuple(sorted(f.canonical() for f in filters)))
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.ranked[start:end], self.partition[start:end]
+
+    def save(self, path: Path):
+        save_arrays(path, {'ranked': self.ranked, 'partition': self.partition, 'offsets': self.offsets},
+                    meta={'openers': self.openers, 'word_length': self.word_length, 'version': self.version})
+
+    @classmethod
+    def load(cls, path: Path):
+        """Memory-maps a book saved with `OpeningBook.save`"""
+        arrays, meta = load_arrays(path)
+        return cls(meta['openers'], meta['word_length'], arrays['ranked'], arrays['partition'], arrays['offsets'],
+                   meta.get('version'))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __repr__(self):
+        return f"OpeningBook(openers={self.openers}, word_length={self.word_length}, states={len(self)})"
+
+
+@lru_cache(maxsize=None)
+def _state_keys(openers: tuple[str, ...], word_length: int) -> dict[tuple, int]:
+    """Position of each state given by its canonical filters. Openers with the same letters share their all-grey state"""
+    states = {}
+    for i, (opener, pattern) in enumerate(OpeningBook._iter_states(list(openers), word_length)):
+        states.setdefault(tuple(sorted(f.canonical() for f in feedback_filters([(opener, pattern)], word_length))), i)
+    return states
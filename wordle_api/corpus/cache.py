@@ -0,0 +1,108 @@
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+from .corpus import WordFilter
+
+
+class ResultCache:
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None, maxbytes: int = None,
+                 sizeof: Callable[[Any], int] = None):
+        """
+        A bounded LRU cache with an optional time-to-live for hint results
+
+        :param maxsize: maximum number of entries kept. The least recently used entry is evicted first
+        :param ttl: number of seconds an entry stays valid. If None, entries never expire
+        :param maxbytes: maximum total size of the values kept, as given by sizeof. Least recently used entries
+            are evicted until the values fit, and values larger than maxbytes are not kept. Unbounded if None
+        :param sizeof: size in bytes of a value, for example `lambda ids: ids.nbytes`. Required with maxbytes
+
+        Examples
+        --------
+        >>> from corpus import ResultCache, WordFilter
+        >>> cache = ResultCache(maxsize=2)
+        >>> a = WordFilter('s', positions=[1], exclude_positions=[], at_least=1, at_most=5)
+        >>> b = WordFilter('e', positions=[], exclude_positions=[], at_least=0, at_most=0)
+        >>> cache.make_key('web2', [a, b], 10) == cache.make_key('web2', [b, a], 10)
+        True
+        """
+        if not (isinstance(maxsize, int) and maxsize > 0):
+            raise ValueError("maxsize must be a positive integer")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        if maxbytes is not None and (maxbytes <= 0 or sizeof is None):
+            raise ValueError("maxbytes must be positive and requires sizeof")
+
+        self._maxsize = maxsize
+        self._ttl = ttl
+        self._maxbytes = maxbytes
+        self._sizeof = sizeof
+        self._bytes = 0
+        # expiry time, value and size of each entry
+        self._data: OrderedDict[Hashable, tuple[float, Any, int]] = OrderedDict()
+        self._lock = Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(source: str, filters: list[WordFilter], limit: int | None, *extra: Hashable) -> tuple:
+        """Canonical key of a query. Filters that only differ in their order map to the same key"""
+        return source, tuple(sorted(f.canonical() for f in filters)), limit, *extra
+
+    def get(self, key: Hashable) -> tuple[bool, Any]:
+        with self._lock:
+            if (entry := self._data.get(key)) is not None:
+                expires, value, _ = entry
+                if expires >= time.monotonic():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return True, value
+
+                self._pop(key)
+                self.expirations += 1
+
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Hashable, value: Any):
+        expires = time.monotonic() + self._ttl if self._ttl is not None else float('inf')
+        size = self._sizeof(value) if self._sizeof is not None else 0
+        with self._lock:
+            self._pop(key)
+            if self._maxbytes is not None and size > self._maxbytes:
+                return
+
+            self._data[key] = expires, value, size
+            self._bytes += size
+
+            while len(self._data) > self._maxsize or (self._maxbytes is not None and self._bytes > self._maxbytes):
+                self._pop(next(iter(self._data)))
+                self.evictions += 1
+
+    def _pop(self, key: Hashable):
+        """Removes the entry of the key if there is one. The caller holds the lock"""
+        if (entry := self._data.pop(key, None)) is not None:
+            self._bytes -= entry[2]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self):
+        return {
+            'size': len(self._data),
+            'maxsize': self._maxsize,
+            'bytes': self._bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+    def __len__(self):
+        return len(self._data)
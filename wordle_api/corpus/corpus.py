@@ -1,6 +1,14 @@
 from collections import Counter
 from dataclasses import dataclass
 
+import numpy as np
+
+from .index import WordIndex
+
+ENGINES = ('set', 'bitset')
+
+_EMPTY: frozenset[str] = frozenset()
+
 
 @dataclass
 class WordFilter:
@@ -13,17 +21,108 @@ class WordFilter:
     def __post_init__(self):
         self.letter = self.letter.upper().strip()
 
+    def canonical(self) -> tuple:
+        """Hashable form of the filter where the order and duplicates of positions do not matter"""
+        return (self.letter,
+                tuple(sorted(set(self.positions))),
+                tuple(sorted(set(self.exclude_positions))),
+                self.at_least,
+                self.at_most)
+
+    @classmethod
+    def from_canonical(cls, canonical: tuple):
+        letter, positions, exclude_positions, at_least, at_most = canonical
+        return cls(letter, list(positions), list(exclude_positions), at_least, at_most)
+
 
 class WordCorpus:
-    def __init__(self, words: set[str], source: str, word_length: int):
+    def __init__(self, words: set[str], source: str, word_length: int, engine: str = 'set',
+                 frequency: dict[str, int] = None):
+        """
+        A collection of words of the same length which can be filtered with WordFilter
+
+        :param words: the words in the corpus. Words that are not of `word_length` are dropped
+        :param source: name of the corpus source
+        :param word_length: length of the words in the corpus
+        :param engine: the filtering engine. 'set' uses Python set operations over the letter maps while
+            'bitset' uses a WordIndex where each filter is a vectorized bitmask operation
+        :param frequency: mapping of upper-cased word to its usage frequency. Words not in the mapping
+            have a frequency of 0
+        """
         if not (isinstance(word_length, int) and word_length > 0):
             raise ValueError("word length must be a positive integer")
         self._word_length = word_length
         self._source = source
 
-        self._words: set[str] = {word for w in words if len(word := w.upper().strip()) == word_length}
-        self._fixed_letter_map = FixedLetterMap(self._words, word_length)
-        self._letter_count_map = LetterCountMap(self._words, word_length)
+        self._words: set[str] | None = None
+        self._fixed_letter_map: FixedLetterMap | None = None
+        self._letter_count_map: LetterCountMap | None = None
+        self._letter_presence_map: LetterPresenceMap | None = None
+        self._build_word_maps({word for w in words if len(word := w.upper().strip()) == word_length})
+
+        frequency = frequency or {}
+        self._frequency = np.array([frequency.get(w, 0) for w in sorted(self._words)], dtype=np.int64)
+
+        self._index: WordIndex | None = None
+        self._members: np.ndarray | None = None
+        self._word_ids: np.ndarray | None = None
+        self._version: str | None = None
+        self.engine = engine
+
+    @classmethod
+    def from_index(cls, index: WordIndex, source: str, frequency: np.ndarray = None, members: np.ndarray = None,
+                   version: str = None):
+        """
+        Creates a corpus using the 'bitset' engine directly from a WordIndex, for example one memory-mapped
+        with `WordIndex.load`. The word sets of the 'set' engine are only built if that engine is selected
+
+        Corpora of different sources can share one index of all their words, each corpus being the members
+        of the index given by its bitmask
+
+        :param index: the word index
+        :param source: name of the corpus source
+        :param frequency: word frequencies aligned to the index
+        :param members: packed bitmask of the words of the index that are in the corpus. Every word of the
+            index is in the corpus if None
+        """
+        corpus = cls.__new__(cls)
+        corpus.__dict__.update(_word_length=index.word_length,
+                               _source=source,
+                               _words=None,
+                               _fixed_letter_map=None,
+                               _letter_count_map=None,
+                               _letter_presence_map=None,
+                               _frequency=frequency,
+                               _index=index,
+                               _members=members,
+                               _word_ids=None,
+                               _version=version,
+                               _engine='bitset')
+        return corpus
+
+    def combine(self, others: list['WordCorpus'], source: str, how: str = 'union') -> 'WordCorpus':
+        """
+        Creates the union or intersection of corpora that share the same index. Only their membership bitmasks
+        are combined so the new corpus costs a bitmask
+
+        :param others: the other corpora
+        :param source: name of the combined corpus
+        :param how: 'union' keeps the words in any of the corpora, 'intersection' the words in all of them
+        """
+        if how not in ('union', 'intersection'):
+            raise ValueError(f"invalid combination: '{how}'. Use 'union' or 'intersection'")
+        if self._index is None or any(c.index is not self._index for c in others):
+            raise ValueError("only corpora sharing the same index can be combined")
+
+        reduce = np.bitwise_or.reduce if how == 'union' else np.bitwise_and.reduce
+        members = reduce([c.members for c in (self, *others)], axis=0)
+        return WordCorpus.from_index(self._index, source, self._frequency, members, self._version)
+
+    def _build_word_maps(self, words: set[str]):
+        self._words = words
+        self._fixed_letter_map = FixedLetterMap(words, self._word_length)
+        self._letter_count_map = LetterCountMap(words, self._word_length)
+        self._letter_presence_map = LetterPresenceMap(words)
 
     def get_potential_words(self, filters: list[WordFilter]) -> set[str]:
         """
@@ -41,22 +140,183 @@ class WordCorpus:
         ...                             WordFilter('e', positions=[], exclude_positions=[], at_least=0, at_most=0)])
         {'SCOTT', 'SHOTT', 'START', 'STILT', 'STINT', 'STITH', 'STOAT', 'STOOT', 'STOUT', 'STRIT', 'STRUT', 'STUNT', 'STURT'}
         """
-        words = self.words.copy()
+        if not self._is_satisfiable(filters):
+            return set()
+
+        if self._engine == 'bitset':
+            return set(self._index.words_of(self._index.filter(filters, self._members)))
+
+        include, exclude, grey = self._plan(filters)
+        if not include:
+            words = self.words
+        else:
+            # start from the smallest bucket instead of a copy of every word
+            words = set().union(*include[0])
+            for buckets in include[1:]:
+                if not words:
+                    return words
+                words = words & buckets[0] if len(buckets) == 1 else set().union(*(words & b for b in buckets))
+
+        for bucket in exclude:
+            # in place removal iterates over the bucket, a new difference over the words. Use the smaller one
+            if len(bucket) < len(words):
+                words -= bucket
+            else:
+                words = words - bucket
+
+        # all the grey letters are excluded at once, after the other filters have shrunk the words
+        if grey and words:
+            words = self._letter_presence_map.without(words, grey)
+
+        return words
+
+    def get_potential_word_ids(self, filters: list[WordFilter]) -> np.ndarray:
+        """
+        Gets the ids of the potential words given a filter list. The ids index into `WordCorpus.index`.
+        Only available with the 'bitset' engine
+
+        :param filters: a list of WordFilter to apply
+        """
+        if self._engine != 'bitset':
+            raise ValueError(f"word ids are only available with the 'bitset' engine. Corpus uses the '{self._engine}' engine")
+
+        if not self._is_satisfiable(filters):
+            return np.empty(0, dtype=np.int64)
+        return self._index.filter(filters, self._members)
+
+    def narrow_word_ids(self, ids: np.ndarray, filters: list[WordFilter]) -> np.ndarray:
+        """
+        Applies additional filters to a previous set of potential word ids. As filters only ever remove words,
+        narrowing the result of `get_potential_word_ids(a)` with `b` gives the same ids as
+        `get_potential_word_ids(a + b)`. Only available with the 'bitset' engine
+
+        :param ids: ids of the current candidates
+        :param filters: the new filters to apply
+        """
+        if self._engine != 'bitset':
+            raise ValueError(f"word ids are only available with the 'bitset' engine. Corpus uses the '{self._engine}' engine")
+
+        if not self._is_satisfiable(filters):
+            return ids[:0]
+        return self._index.narrow(ids, filters)
+
+    def _is_satisfiable(self, filters: list[WordFilter]) -> bool:
+        """
+        Validates the positions and counts of the filters and checks that they do not contradict each other,
+        for example a letter with at_least > at_most, two letters fixed to the same position or more letters
+        required than the word length. No word can match contradictory filters
+
+        Examples
+        --------
+        >>> from corpus import WordCorpus, WordFilter
+        >>> corpus = WordCorpus({'SCOTT', 'START'}, 'web2', 5)
+        >>> corpus._is_satisfiable([WordFilter('s', [1], [], 1, 5), WordFilter('t', [1], [], 1, 5)])
+        False
+        """
+        fixed: dict[int, str] = {}
+        excluded: set[tuple[int, str]] = set()
+        at_least: dict[str, int] = {}
+        at_most: dict[str, int] = {}
+
+        for x in filters:
+            for pos in (*x.positions, *x.exclude_positions):
+                if not (1 <= pos <= self._word_length):
+                    raise ValueError(f"letter '{x.letter}' position must be between [1, {self._word_length}]. Got {pos}")
+            if not (0 <= x.at_least <= self._word_length and 0 <= x.at_most <= self._word_length):
+                raise ValueError(f"letter '{x.letter}' min_count and max_count must be between [0, {self._word_length}]. "
+                                 f"Got min_count={x.at_least} and max_count={x.at_most}")
+
+            for pos in x.positions:
+                if fixed.setdefault(pos, x.letter) != x.letter:
+                    return False
+            excluded.update((pos, x.letter) for pos in x.exclude_positions)
+
+            # the letter must occur at least once per fixed position
+            at_least[x.letter] = max(at_least.get(x.letter, 0), x.at_least, len(set(x.positions)))
+            # at_most only constrains the count together with at_least > 0 or for grey letters
+            if x.at_least > 0 or x.at_most == 0:
+                at_most[x.letter] = min(at_most.get(x.letter, self._word_length), x.at_most)
+
+        if any((pos, letter) in excluded for pos, letter in fixed.items()):
+            return False
+        if any(at_least[letter] > n for letter, n in at_most.items()):
+            return False
+        return sum(at_least.values()) <= self._word_length
+
+    def _plan(self, filters: list[WordFilter]):
+        """
+        Plans the set operations of the 'set' engine using the sizes of the letter map buckets as cardinality
+        estimates, so that the most selective constraints shrink the words first
+
+        :return: the constraints to intersect, each a list of buckets whose union is the allowed words, ordered
+            from the smallest to the largest estimated size; the buckets of words to remove and the grey letters
+        """
+        include: list[tuple[int, list[set[str]]]] = []
+        exclude: list[set[str]] = []
+        grey = set()
 
-        # filter for possible words first
         for x in filters:
             for pos in x.positions:
-                words &= self._fixed_letter_map.get(pos, x.letter)
+                bucket = self._fixed_letter_map.get(pos, x.letter)
+                include.append((len(bucket), [bucket]))
 
             for pos in x.exclude_positions:
-                words -= self._fixed_letter_map.get(pos, x.letter)
+                exclude.append(self._fixed_letter_map.get(pos, x.letter))
 
             if x.at_least > 0:
-                words &= self._letter_count_map.get(x.letter, x.at_least, x.at_most)
+                buckets = self._letter_count_map.buckets(x.letter, x.at_least, x.at_most)
+                include.append((sum(map(len, buckets)), buckets))
             elif x.at_most == 0:
-                words = {w for w in words if x.letter not in w}
+                grey.add(x.letter)
 
-        return words
+        include.sort(key=lambda constraint: constraint[0])
+        exclude.sort(key=len, reverse=True)
+        return [buckets for _, buckets in include], exclude, grey
+
+    @property
+    def engine(self):
+        return self._engine
+
+    @engine.setter
+    def engine(self, engine: str):
+        if engine not in ENGINES:
+            raise ValueError(f"invalid engine: '{engine}'. Use one of {ENGINES}")
+
+        if engine == 'bitset' and self._index is None:
+            self._index = WordIndex.from_words(self._words, self._word_length)
+        elif engine == 'set' and self._words is None:
+            self._build_word_maps(set(self._index.words_of(self.word_ids)))
+        self._engine = engine
+
+    @property
+    def index(self) -> WordIndex | None:
+        return self._index
+
+    @property
+    def members(self) -> np.ndarray:
+        """Packed bitmask of the words of `WordCorpus.index` that are in the corpus"""
+        if self._members is None:
+            return self._index.mask([])
+        return self._members
+
+    @property
+    def word_ids(self) -> np.ndarray:
+        """Sorted ids of the words of the corpus in `WordCorpus.index`"""
+        if self._word_ids is None:
+            self._word_ids = np.arange(len(self._index)) if self._members is None else self._index.ids_of(self._members)
+        return self._word_ids
+
+    @property
+    def frequency(self) -> np.ndarray:
+        """Word frequencies aligned to `WordCorpus.index`, so that `frequency[ids]` are the frequencies of word ids"""
+        if self._frequency is None:
+            return np.zeros(len(self._index) if self._index is not None else len(self), dtype=np.int64)
+        return self._frequency
+
+    @property
+    def version(self) -> str | None:
+        """Build version of the word table the corpus was loaded from. None for corpora built from words"""
+        return self._version
 
     @property
     def word_length(self):
@@ -68,16 +328,24 @@ class WordCorpus:
 
     @property
     def words(self):
+        if self._words is None:
+            return set(self._index.words_of(self.word_ids))
         return self._words.copy()
 
     def __len__(self):
+        if self._words is None:
+            return len(self.word_ids)
         return len(self._words)
 
     def __contains__(self, word: str):
+        if self._words is None:
+            if (i := self._index.find(word.upper().strip())) is None:
+                return False
+            return self._members is None or bool(self._members[i >> 3] & (0x80 >> (i & 7)))
         return word.upper().strip() in self._words
 
     def __repr__(self):
-        words = list(self._words)
+        words = list(self._words) if self._words is not None else self._index.words_of(self.word_ids[:6])
         if len(words) > 5:
             words_repr = f"{{{', '.join(repr(w) for w in words[:5])}, ...}}"
         else:
@@ -109,7 +377,7 @@ class FixedLetterMap:
                 self._map[pos][letter].add(word)
 
     def get(self, position: int, letter: str):
-        return self._map[position][letter]
+        return self._map[position].get(letter, _EMPTY)
 
 
 class LetterCountMap:
@@ -131,10 +399,37 @@ class LetterCountMap:
         if not (0 < min_count <= max_count <= self._word_length):
             raise ValueError(f"letter '{letter}' min_count and max_count must be between [0, {self._word_length}] and min_count must be <= max_count. "
                              f"Got min_count={min_count} and max_count={max_count}")
-        letter_count_map = self._map[letter]
 
         words = set()
-        for i in range(min_count, max_count + 1):
-            words |= letter_count_map.get(i, set())
+        for bucket in self.buckets(letter, min_count, max_count):
+            words |= bucket
 
         return words
+
+    def buckets(self, letter: str, min_count: int, max_count: int) -> list[set[str]]:
+        """The sets of words with each count of the letter between min_count and max_count"""
+        letter_count_map = self._map.get(letter, {})
+        return [letter_count_map[i] for i in range(min_count, max_count + 1) if i in letter_count_map]
+
+
+class LetterPresenceMap:
+    """
+    LetterPresenceMap collects, for every letter, the words that do not contain it. Excluding grey letters is
+    then an intersection with these sets instead of a scan over the candidate words
+    """
+
+    def __init__(self, words: set[str]):
+        alphabet = set().union(*words)
+        self._absent_map: dict[str, set[str]] = {letter: set() for letter in alphabet}
+
+        for word in words:
+            for letter in alphabet.difference(word):
+                self._absent_map[letter].add(word)
+
+    def without(self, words: set[str], letters: set[str]) -> set[str]:
+        """Returns the words that contain none of the letters"""
+        # letters that are not in the corpus at all exclude nothing
+        absent = sorted((self._absent_map[x] for x in letters if x in self._absent_map), key=len)
+        if not absent:
+            return words
+        return words.intersection(*absent)
@@ -1,20 +1,39 @@
-import io
+import hashlib
+import json
 import os
 import pickle
-import zipfile
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from functools import lru_cache
 from pathlib import Path
+from threading import Lock
+from typing import Any, Callable, Iterable, TYPE_CHECKING
 
-import pandas as pd
-import requests
-from tqdm import tqdm
+import numpy as np
 
+from .book import OpeningBook
 from .corpus import WordCorpus
+from .index import WordIndex
+from .solver import feedback_matrix, load_feedback_matrix, save_feedback_matrix
+from .storage import atomic_write
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+# pandas, requests and tqdm are only imported by the methods that download sources or build corpora, so that
+# serving prebuilt corpora does not need them
 
 
 class CorpusFactory:
-    __corpus_instances__: dict[str, WordCorpus] = {}
+    # corpora keyed by source, word length and filtering engine
+    __corpus_instances__: dict[tuple[str, int, str], WordCorpus] = {}
+    __corpus_locks__: dict[tuple, Lock] = {}
+    # feedback matrices keyed by source, word length and build version of the word table
+    __feedback_matrices__: dict[tuple[str, int, str | None], np.ndarray] = {}
+    # (index, extra arrays, metadata) of the word table shared by the corpora of each word length
+    __word_tables__: dict[int, tuple[WordIndex, dict[str, np.ndarray], dict]] = {}
+    # (build version, opening book or None if there is none for that version) of each source and word length
+    __opening_books__: dict[tuple[str, int], tuple[str | None, OpeningBook | None]] = {}
+    __lock__ = Lock()
 
     __data_source__ = {
         'coca': {
@@ -72,10 +91,19 @@ class CorpusFactory:
         }
     }
 
-    def __init__(self, word_length=5):
+    def __init__(self, word_length=5, engine='set', on_load: Callable[[str, int], Any] = None, build=True):
         """
         A factory to create corpus
 
+        :param word_length: length of the words in the corpus, or a collection of lengths to serve corpora of
+            several word lengths. The first length is the default one
+        :param engine: the filtering engine used by the corpus. See WordCorpus for details
+        :param on_load: called with the source and word length whenever `get_corpus` loads or builds a corpus,
+            for example to count the loads
+        :param build: build the word table with a source that it does not include when its corpus is loaded.
+            Servers should not, building downloads the sources. Loading a corpus that was not built raises a
+            ValueError instead
+
         Examples
         --------
         >>> from corpus import CorpusFactory
@@ -84,12 +112,28 @@ class CorpusFactory:
         >>> corpus
         WordCorpus(source='web2', word_length=5, words={'BARON', 'PHORA', 'HOOEY', 'KOYAN', 'FEEZE', ...})
         """
-        self._word_length = word_length
+        self._word_lengths: tuple[int, ...] = (word_length,) if isinstance(word_length, int) else tuple(dict.fromkeys(word_length))
+        if not self._word_lengths or not all(isinstance(n, int) and n > 0 for n in self._word_lengths):
+            raise ValueError("word lengths must be positive integers")
+
+        self._word_length = self._word_lengths[0]
+        self._engine = engine
+        self._on_load = on_load
+        self._build = build
 
     @property
     def sources(self):
         return list(self.__data_source__)
 
+    @property
+    def word_length(self):
+        """The default word length"""
+        return self._word_length
+
+    @property
+    def word_lengths(self):
+        return list(self._word_lengths)
+
     @staticmethod
     def _get_cache_folder(*paths: str):
         cache_folder = Path(os.getenv('WORDLE_FOLDER', Path.home())) / ".wordle"
@@ -101,23 +145,190 @@ class CorpusFactory:
 
         return cache_folder
 
-    def get_corpus(self, source='web2'):
-        """Gets the corpus object"""
-        if source in self.__corpus_instances__:
-            return self.__corpus_instances__[source]
+    def get_corpus(self, source='web2', word_length: int = None):
+        """
+        Gets the corpus object. Concurrent calls for the same corpus wait for a single load instead of
+        each loading the corpus
 
-        if source not in self.__data_source__:
-            raise ValueError(f"{source} is not a valid corpus source. Use one of {tuple(self.__data_source__.keys())}")
-        file_location = self._corpus_pickle_filepath(source)
+        :param source: the corpus source. Sources joined by '|' give the union of their corpora and sources
+            joined by '&' their intersection, for example 'web2|coca'. Combined sources are named by their
+            `canonical_source`
+        :param word_length: one of the factory's word lengths. Defaults to the factory's default word length
+        """
+        source = self.canonical_source(source)
+        key = source, self._check_word_length(word_length), self._engine
+        if key in self.__corpus_instances__:
+            return self.__corpus_instances__[key]
+
+        sources, how = self.split_source(source)
+        if invalid := [s for s in sources if s not in self.__data_source__]:
+            raise ValueError(f"{invalid[0]} is not a valid corpus source. Use one of {tuple(self.__data_source__.keys())}")
+
+        with self._get_corpus_lock(key):
+            if key in self.__corpus_instances__:
+                return self.__corpus_instances__[key]
+
+            while True:
+                if how is None:
+                    corpus = self.load_corpus(source, key[1])
+                else:
+                    first, *others = [self.get_corpus(s, key[1]) for s in sources]
+                    if any(c.index is not first.index for c in others):
+                        # the table was swapped between loading the sources
+                        continue
+                    corpus = first.combine(others, source, how)
+                    corpus.engine = self._engine
+
+                # a swap of the table since the corpus was created only refreshed the corpora stored by then
+                # (see `_swap_table`), so a corpus of a previous table is created again instead of being stored
+                with self._get_corpus_lock(('tables',)):
+                    if (table := self.__word_tables__.get(key[1])) is None or table[2].get('version') == corpus.version:
+                        self.__corpus_instances__[key] = corpus
+                        break
+
+            if self._on_load is not None:
+                self._on_load(source, key[1])
+            return corpus
+
+    def preload(self, sources: list[str] = None):
+        """
+        Loads the corpora of every word length in parallel so that requests do not pay for the first load
 
-        if not file_location.exists():
-            corpus = self.create_corpus(source)
-        else:
-            with open(file_location, 'rb') as f:
-                corpus = pickle.load(f)
+        :param sources: the corpus sources to load. Defaults to the sources the saved word tables were built with
+        """
+        keys = [(s, n) for n in self._word_lengths for s in (self.built_sources(n) if sources is None else sources)]
+        if not keys:
+            return []
 
-        self.__corpus_instances__[source] = corpus
-        return corpus
+        with ThreadPoolExecutor(len(keys)) as pool:
+            return list(pool.map(lambda key: self.get_corpus(*key), keys))
+
+    def get_feedback_matrix(self, source='web2', word_length: int = None, max_words: int = None, compute=True):
+        """
+        Gets the guess x answer feedback matrix of the corpus (see `corpus.solver.feedback_matrix`). The matrices
+        are built with the corpora (see `create_feedback_matrices`) and memory-mapped. Combined sources have no
+        matrix, it would be computed and held in memory for every combination
+
+        :param source: the corpus source, a single source
+        :param word_length: one of the factory's word lengths. Defaults to the factory's default word length
+        :param max_words: refuse to compute the matrix for corpora with more words, as it grows with the
+            square of the number of words
+        :param compute: compute and save the matrix if it was not built. Servers should not, computing a
+            matrix takes seconds and hundreds of MB for large corpora
+        """
+        if self.split_source(source)[1] is not None:
+            raise ValueError(f"feedback matrices are only built for single sources, not '{source}'. "
+                             f"Use one of {tuple(self.__data_source__.keys())}")
+
+        corpus = self.get_corpus(source, word_length)
+        key = corpus.source, corpus.word_length, corpus.version
+        if key in self.__feedback_matrices__:
+            return self.__feedback_matrices__[key]
+
+        with self._get_corpus_lock(('feedback', *key)):
+            if key in self.__feedback_matrices__:
+                return self.__feedback_matrices__[key]
+
+            if max_words is not None and len(corpus) > max_words:
+                raise ValueError(f"'{source}' corpus has {len(corpus)} words, the solver supports at most {max_words}")
+
+            path = self._feedback_matrix_filepath(*key)
+            matrix = None
+            if not path.exists():
+                if not compute:
+                    raise ValueError(f"the feedback matrix of the '{source}' corpus with word length "
+                                     f"{corpus.word_length} was not built")
+                matrix = self._save_feedback_matrix(corpus, path)
+
+            try:
+                matrix = load_feedback_matrix(path)
+            except FileNotFoundError:
+                # removed by another process that rebuilt the table since. The matrix computed here still
+                # matches the version of the corpus
+                if matrix is None:
+                    raise
+
+            self.__feedback_matrices__[key] = matrix
+            return matrix
+
+    def create_feedback_matrices(self, sources: Iterable[str] = None, max_words: int = None, force=False):
+        """
+        Computes and saves the feedback matrices of the corpora of each source and word length for the solver.
+        Matrices already saved for the current data are kept
+
+        :param sources: the corpus sources. Defaults to the sources already downloaded
+        :param max_words: skip the corpora with more words, the matrix has the square of their number of cells
+        :param force: compute the matrices even if they are up to date
+        """
+        sources = self._downloaded_sources() if sources is None else list(sources)
+        for n in self._word_lengths:
+            for source in sources:
+                corpus = self.get_corpus(source, n)
+                if max_words is not None and len(corpus) > max_words:
+                    print(f"Skipping the feedback matrix of '{source}' with word length {n}: {len(corpus)} words")
+                    continue
+
+                path = self._feedback_matrix_filepath(source, n, corpus.version)
+                if force or not path.exists():
+                    self._save_feedback_matrix(corpus, path)
+                    self.__feedback_matrices__.pop((source, n, corpus.version), None)
+
+    @staticmethod
+    def _save_feedback_matrix(corpus: WordCorpus, path: Path):
+        matrix = feedback_matrix(corpus.index.letters[corpus.word_ids])
+        save_feedback_matrix(path, matrix)
+        return matrix
+
+    @staticmethod
+    def split_source(source: str) -> tuple[list[str], str | None]:
+        """
+        Splits a source into the sorted distinct sources it combines and how they are combined: 'union' for
+        sources joined by '|', 'intersection' for sources joined by '&' and None for a single source
+
+        Examples
+        --------
+        >>> from corpus import CorpusFactory
+        >>> CorpusFactory.split_source('web2 | coca|web2')
+        (['coca', 'web2'], 'union')
+        >>> CorpusFactory.split_source('web2&web2')
+        (['web2'], None)
+        """
+        if '|' in source and '&' in source:
+            raise ValueError(f"invalid corpus source: '{source}'. Sources can be combined with either '|' or '&', not both")
+
+        for sep, how in (('|', 'union'), ('&', 'intersection')):
+            if sep in source:
+                sources = sorted({s.strip() for s in source.split(sep)})
+                return sources, how if len(sources) > 1 else None
+        return [source.strip()], None
+
+    @classmethod
+    def canonical_source(cls, source: str) -> str:
+        """
+        Name of the source that is the same for every spelling of a combination of sources, so that each
+        combination is loaded and cached once
+
+        Examples
+        --------
+        >>> from corpus import CorpusFactory
+        >>> CorpusFactory.canonical_source('web2 | coca|web2')
+        'coca|web2'
+        """
+        sources, how = cls.split_source(source)
+        return {'union': '|', 'intersection': '&', None: ''}[how].join(sources)
+
+    def _check_word_length(self, word_length: int | None):
+        if word_length is None:
+            return self._word_length
+        if word_length not in self._word_lengths:
+            raise ValueError(f"word length {word_length} is not supported. Use one of {self._word_lengths}")
+        return word_length
+
+    def _get_corpus_lock(self, key: tuple[str, int]):
+        with self.__lock__:
+            if key not in self.__corpus_locks__:
+                self.__corpus_locks__[key] = Lock()
+            return self.__corpus_locks__[key]
 
     def get_corpus_source(self, source: str) -> set[str]:
         """Gets the corpus's full word set. Downloads from source if it does not exist in cache"""
@@ -130,13 +341,35 @@ class CorpusFactory:
             return self.download_corpus_source(source)
 
     @lru_cache(maxsize=1)
-    def get_word_frequency_table(self) -> pd.DataFrame:
+    def get_word_frequency_table(self) -> 'pd.DataFrame':
         """Gets the word frequency table"""
+        import pandas as pd
+
         return pd.read_pickle(self._word_frequency_table_filepath())
 
-    def recreate_data_files(self, reload_source=True, reload_corpus=True, reload_frequency=True):
+    @lru_cache(maxsize=None)
+    def get_word_frequencies(self, word_length: int = None) -> dict[str, int]:
+        """Gets the frequency of each upper-cased word of the given word length"""
+        table = self.get_word_frequency_table()
+        return (table[table['word'].str.len() == self._check_word_length(word_length)]
+                .set_index('word')['frequency']
+                .rename(index=str.upper)
+                .to_dict())
+
+    def recreate_data_files(self, reload_source=True, reload_corpus=True, reload_frequency=True, force=False,
+                            openers: Iterable[str] = None, solver_max_words: int = None):
         """
-        Recreates all data files such as the source word list, frequency counts, corpus and stash the results
+        Recreates all data files such as the source word list, frequency counts, corpus and stash the results.
+        Source word lists only keep words of the factory's word lengths.
+
+        The build is incremental: sources and the frequency table are not downloaded again when the server
+        reports them unchanged (see `download_corpus_source`), and the word tables are not built again when
+        the content hashes of their sources and frequency table are the ones they were built from
+
+        :param force: download and build everything again
+        :param openers: opening words to build the opening books of (see `create_opening_books`)
+        :param solver_max_words: build the solver's feedback matrices of the corpora with at most this many words
+            (see `create_feedback_matrices`). No matrix is built if None
 
         Examples
         --------
@@ -144,31 +377,95 @@ class CorpusFactory:
         >>> factory = CorpusFactory(5)
         >>> factory.recreate_data_files(reload_source=False, reload_frequency=False)  # doctest: +SKIP
         """
+        from tqdm import tqdm
+
         total = len(self.sources)
 
-        with ThreadPoolExecutor(total) as pool:
-            if reload_source:
-                with tqdm(desc="Reloading source", total=total) as bar:
-                    futures = [pool.submit(self.download_corpus_source, source=s) for s in self.sources]
-                    for future in as_completed(futures):
-                        if (err := future.exception()) is not None:
-                            raise err
-                        bar.update()
-
-            if reload_corpus:
-                with tqdm(desc="Creating Corpus", total=total) as bar:
-                    futures = [pool.submit(self.create_corpus, source=s) for s in self.sources]
-                    for future in as_completed(futures):
-                        if (err := future.exception()) is not None:
-                            raise err
-                        bar.update()
-
-            if reload_frequency:
-                print("Reloading frequency table")
-                self.download_word_frequencies()
-
-    def download_corpus_source(self, source: str):
+        if reload_frequency:
+            print("Reloading frequency table")
+            self.download_word_frequencies(force)
+
+        if reload_source:
+            with (ThreadPoolExecutor(total) as pool, ProcessPoolExecutor() as ingest_pool,
+                  tqdm(desc="Reloading source", total=total) as bar):
+                futures = [pool.submit(self.download_corpus_source, source=s, word_lengths=self._word_lengths,
+                                       pool=ingest_pool, force=force)
+                           for s in self.sources]
+                for future in as_completed(futures):
+                    if (err := future.exception()) is not None:
+                        raise err
+                    bar.update()
+
+        if reload_corpus:
+            if force or self._tables_outdated(self.sources):
+                print("Creating corpora")
+                self.create_corpora(self.sources)
+            else:
+                print("Corpora are up to date")
+
+        if openers:
+            print("Creating opening books")
+            self.create_opening_books(openers, self.sources, force)
+
+        if solver_max_words:
+            print("Creating feedback matrices")
+            self.create_feedback_matrices(self.sources, solver_max_words, force)
+
+    def _tables_outdated(self, sources: list[str]):
+        """Whether a word table is missing or was built from other sources or frequency table than the current ones"""
+        if not self._word_frequency_table_filepath().exists():
+            return True
+
+        hashes = {}
+        for source in sources:
+            if (digest := self._read_build_info(source).get('sha256')) is None:
+                # sources downloaded before build info was recorded
+                if not self._corpus_source_filepath(source).exists():
+                    return True
+                with open(self._corpus_source_filepath(source), 'rb') as f:
+                    words = pickle.load(f)
+                digest = _content_hash(words)
+                self._write_build_info({'sha256': digest, 'words': len(words)}, source)
+            hashes[source] = digest
+
+        frequency = _file_hash(self._word_frequency_table_filepath())
+        for n in self._word_lengths:
+            if not (path := self._word_table_filepath(n)).exists():
+                return True
+            meta = WordIndex.load(path)[2]
+            if meta.get('hashes') != hashes or meta.get('frequency') != frequency:
+                return True
+        return False
+
+    def download_corpus_source(self, source: str, word_lengths: Iterable[int] = None, pool: Executor = None,
+                               force=False):
+        """
+        Downloads the corpus' source words and stashes them with their build info: the content hash of the
+        words, the word lengths kept and the validators (ETag, Last-Modified) of the downloaded urls.
+
+        The download is skipped when the source was already downloaded for the same word lengths and the
+        validators of its urls are unchanged
+
+        :param source: the corpus source
+        :param word_lengths: only keep words of these lengths. Keeps words of any length if None
+        :param pool: process pool used to tokenize the members of zipped sources in parallel
+        :param force: download the source even if it is unchanged
+        """
+        import requests
+
+        from .ingest import read_zip_words, spool
+
         details = self.__data_source__[source]
+        lengths = None if word_lengths is None else set(word_lengths)
+
+        info = self._read_build_info(source)
+        validators = {url: _remote_validators(url) for url in self._source_urls(source)}
+        kept = None if lengths is None else sorted(lengths)
+        if (not force and self._corpus_source_filepath(source).exists() and info.get('word_lengths') == kept
+                and all(validators.values()) and info.get('validators') == validators):
+            with open(self._corpus_source_filepath(source), 'rb') as f:
+                return pickle.load(f)
+
         if os.getenv("GITHUB_SOURCE", '0') == '1':
             url = details['github']
             resp = requests.get(url)
@@ -177,6 +474,8 @@ class CorpusFactory:
                 raise requests.exceptions.RequestException(f"Could not get corpus data from: {url}")
 
             words = pickle.loads(resp.content)
+            if lengths is not None:
+                words = {w for w in words if len(w) in lengths}
         else:
             match home := details['home']:
                 case 'freebsd':
@@ -184,56 +483,303 @@ class CorpusFactory:
                     words = set()
                     for url in urls:
                         resp = requests.get(url)
-                        words |= {word for w in resp.text.split('\n') if (word := w.strip().upper()).isalpha()}
+                        words |= {word for w in resp.text.split('\n')
+                                  if (word := w.strip().upper()).isalpha() and (lengths is None or len(word) in lengths)}
 
                 case 'corpusdata':
-                    url = details['url']
-                    resp = requests.get(url)
-
-                    if not resp.ok:
-                        raise requests.exceptions.RequestException(f"Could not get corpus data from: {url}")
+                    with spool(details['url']) as path:
+                        words = read_zip_words(path, lengths, pool)
 
-                    words = set()
-                    with zipfile.ZipFile(io.BytesIO(resp.content)) as zf:
-                        for info in zf.infolist():
-                            if info.filename.endswith('.txt'):
-                                for line in zf.open(info).readlines():
-                                    for word in line.split(b'\t'):
-                                        try:
-                                            word = word.upper().strip()
-                                            if word.isalpha():
-                                                words.add(word.decode())
-                                        except UnicodeEncodeError:
-                                            pass
                 case _:
                     raise ValueError(f"invalid source home: '{home}'")
 
         with open(self._corpus_source_filepath(source), 'wb') as f:
             pickle.dump(words, f)
+        self._write_build_info({'sha256': _content_hash(words), 'words': len(words), 'word_lengths': kept,
+                                'validators': validators}, source)
 
         return words
 
+    def _source_urls(self, source: str) -> list[str]:
+        details = self.__data_source__[source]
+        if os.getenv("GITHUB_SOURCE", '0') == '1':
+            return [details['github']]
+        return details['url'] if isinstance(details['url'], list) else [details['url']]
+
+    def _build_info_filepath(self, source: str = None):
+        """Build info of the source, or of the word frequency table if source is None"""
+        if source is None:
+            return self._get_cache_folder() / 'word_frequency.json'
+        return self._get_cache_folder(source) / 'build.json'
+
+    def _read_build_info(self, source: str = None) -> dict:
+        try:
+            return json.loads(self._build_info_filepath(source).read_text())
+        except (OSError, ValueError):
+            return {}
+
+    def _write_build_info(self, info: dict, source: str = None):
+        with atomic_write(self._build_info_filepath(source), 'w') as f:
+            f.write(json.dumps(info, indent=2))
+
     def _corpus_source_filepath(self, source: str):
         return self._get_cache_folder(source) / 'source.p'
 
-    def _corpus_pickle_filepath(self, source: str):
-        return self._get_cache_folder(source) / f'length_{self._word_length}.p'
+    def _word_table_filepath(self, word_length: int):
+        return self._get_cache_folder() / f'length_{word_length}.idx'
+
+    def _feedback_matrix_filepath(self, source: str, word_length: int, version: str = None):
+        # the matrix rows follow the word ids of the table, which change with its version
+        name = f'feedback_{word_length}.npy' if version is None else f'feedback_{word_length}_{version}.npy'
+        return self._get_cache_folder(source) / name
+
+    def _opening_book_filepath(self, source: str, word_length: int):
+        return self._get_cache_folder(source) / f'book_{word_length}.idx'
 
     def _word_frequency_table_filepath(self):
         return self._get_cache_folder() / "word_frequency.p"
 
-    def create_corpus(self, source: str):
-        words = self.get_corpus_source(source)
+    def create_corpus(self, source: str, word_length: int = None):
+        """
+        Creates the corpus from its source words. The word tables are built again with the source and every
+        source already downloaded (see `create_corpora`)
+        """
+        word_length = self._check_word_length(word_length)
+        return self.create_corpora(self._downloaded_sources(source))[source, word_length]
+
+    def create_corpora(self, sources: Iterable[str] = None) -> dict[tuple[str, int], WordCorpus]:
+        """
+        Creates the corpora of the sources for every word length of the factory. All the corpora of a word
+        length share a single word table, an index of the words of every source, and each corpus is the
+        bitmask of its words in the table. The table is saved with the bitmasks as a memory-mappable file.
 
-        corpus = WordCorpus(words, source, self._word_length)
-        fp = self._corpus_pickle_filepath(source)
-        with open(fp, 'wb') as f:
-            pickle.dump(corpus, f)
+        Each table records the content hashes of its sources and frequency table and a build version derived
+        from them. Loaded corpora are swapped for the ones of the new tables (see `_swap_table`)
 
+        :param sources: the corpus sources. Defaults to the sources already downloaded
+        :return: the corpora keyed by source and word length
+        """
+        sources = self._downloaded_sources() if sources is None else list(dict.fromkeys(sources))
+        with self._get_corpus_lock(('tables',)):
+            return self._build_tables(sources)
+
+    def _build_tables(self, sources: list[str]):
+        """Builds and saves the word tables of the sources. The caller holds the tables lock"""
+        # each source is read and bucketed by word length once
+        buckets: dict[tuple[str, int], set[str]] = {(s, n): set() for s in sources for n in self._word_lengths}
+        hashes = {}
+        for source in sources:
+            words = self.get_corpus_source(source)
+            hashes[source] = _content_hash(words)
+            for w in words:
+                if (bucket := buckets.get((source, len(word := w.upper().strip())))) is not None:
+                    bucket.add(word)
+
+        frequency = _file_hash(self._word_frequency_table_filepath())
+
+        corpora = {}
+        for n in self._word_lengths:
+            index = WordIndex.from_words(set().union(*(buckets[s, n] for s in sources)), n)
+            frequencies = self.get_word_frequencies(n)
+            extra = {'frequency': np.array([frequencies.get(w, 0) for w in index.words.tolist()], dtype=np.int64),
+                     **{f'members_{s}': index.mask_of(buckets[s, n]) for s in sources}}
+            version = hashlib.sha256(json.dumps([n, hashes, frequency], sort_keys=True).encode()).hexdigest()[:16]
+            meta = {'sources': sources, 'hashes': hashes, 'frequency': frequency, 'version': version}
+            path = self._word_table_filepath(n)
+            previous = WordIndex.load(path)[2].get('version') if path.exists() else None
+            index.save(path, extra=extra, meta=meta)
+
+            built = self._swap_table(n, (index, extra, meta))
+            corpora.update({(s, n): built.get((s, self._engine)) or self._table_corpus(s, n) for s in sources})
+
+            # the feedback matrices of older versions do not match the word ids of the table anymore. Those of
+            # the previous table are kept for the servers still using it until they reload
+            kept = {self._feedback_matrix_filepath(sources[0], n, v).name for v in (version, previous)}
+            for source in sources:
+                folder = self._get_cache_folder(source)
+                for path in [folder / f'feedback_{n}.npy', *folder.glob(f'feedback_{n}_*.npy')]:
+                    if path.name not in kept:
+                        path.unlink(missing_ok=True)
+
+        return corpora
+
+    def _swap_table(self, word_length: int, table: tuple[WordIndex, dict[str, np.ndarray], dict]):
+        """
+        Makes the table the word table of its word length. The corpora of the length already loaded are
+        created from the new table first and then swapped in at once, so requests never wait for the swap and
+        those holding a corpus of the previous table finish with it. The caller holds the tables lock
+
+        :return: the corpora of the single sources that were created, keyed by source and engine
+        """
+        sources = table[2]['sources']
+        self.__word_tables__[word_length] = table
+
+        built: dict[tuple[str, str], WordCorpus] = {}
+
+        def base(source: str, engine: str):
+            if (source, engine) not in built:
+                built[source, engine] = self._table_corpus(source, word_length, engine)
+            return built[source, engine]
+
+        fresh, dropped = {}, []
+        for key in [k for k in self.__corpus_instances__ if k[1] == word_length]:
+            parts, how = self.split_source(key[0])
+            if any(p not in sources for p in parts):
+                # loaded again, with the table built anew, on the next request
+                dropped.append(key)
+            elif how is None:
+                fresh[key] = base(key[0], key[2])
+            else:
+                first, *others = [base(p, key[2]) for p in parts]
+                fresh[key] = first.combine(others, key[0], how)
+                fresh[key].engine = key[2]
+
+        self.__corpus_instances__.update(fresh)
+        for key in dropped:
+            self.__corpus_instances__.pop(key, None)
+
+        version = table[2].get('version')
+        for key in [k for k in self.__feedback_matrices__ if k[1] == word_length and k[2] != version]:
+            self.__feedback_matrices__.pop(key, None)
+
+        return built
+
+    def reload(self) -> dict[int, str]:
+        """
+        Picks up the word tables saved since they were loaded, for example by `recreate_data_files` running in
+        another process, and swaps them in (see `_swap_table`). Tables are memory-mapped, so the previous
+        tables are only kept until the requests still using them finish
+
+        :return: the build version of each word length that was reloaded
+        """
+        reloaded = {}
+        with self._get_corpus_lock(('tables',)):
+            for n in self._word_lengths:
+                if (current := self.__word_tables__.get(n)) is None or not (path := self._word_table_filepath(n)).exists():
+                    continue
+
+                table = WordIndex.load(path)
+                if (version := table[2].get('version')) is not None and version == current[2].get('version'):
+                    continue
+
+                self._swap_table(n, table)
+                reloaded[n] = version
+
+        return reloaded
+
+    def data_version(self, word_length: int = None) -> str | None:
+        """Build version of the loaded word table of the word length. None if it is not loaded"""
+        table = self.__word_tables__.get(self._check_word_length(word_length))
+        return None if table is None else table[2].get('version')
+
+    def create_opening_books(self, openers: Iterable[str], sources: Iterable[str] = None, force=False):
+        """
+        Builds the opening book of each source and word length (see `corpus.book.OpeningBook`) with the openers
+        of that length. Books already built with the same openers for the current data are kept
+
+        :param openers: opening words, of any of the factory's word lengths
+        :param sources: the corpus sources. Defaults to the sources already downloaded
+        :param force: build the books even if they are up to date
+        """
+        from .rankers import WordRanker
+
+        sources = self._downloaded_sources() if sources is None else list(sources)
+        for n in self._word_lengths:
+            if not (words := list(dict.fromkeys(w.strip().upper() for w in openers if len(w.strip()) == n))):
+                continue
+
+            ranker = WordRanker(n)
+            for source in sources:
+                corpus = self.get_corpus(source, n)
+                path = self._opening_book_filepath(source, n)
+                if not force and path.exists():
+                    book = OpeningBook.load(path)
+                    if book.version == corpus.version and book.openers == words:
+                        continue
+
+                # the book is built from ids, which the 'set' engine does not give
+                bitset = WordCorpus.from_index(corpus.index, source, corpus.frequency, corpus.members, corpus.version)
+                OpeningBook.build(bitset, ranker, words).save(path)
+                self.__opening_books__.pop((source, n), None)
+
+    def get_opening_book(self, source: str, word_length: int = None) -> OpeningBook | None:
+        """
+        Gets the opening book of the corpus. None if no book was built for the current data of the corpus, or
+        if the source combines other sources
+        """
+        corpus = self.get_corpus(source, word_length)
+        key = corpus.source, corpus.word_length
+        if (entry := self.__opening_books__.get(key)) is not None and entry[0] == corpus.version:
+            return entry[1]
+
+        book = None
+        if self.split_source(corpus.source)[1] is None and (path := self._opening_book_filepath(*key)).exists():
+            book = OpeningBook.load(path)
+            if book.version != corpus.version:
+                book = None
+
+        self.__opening_books__[key] = corpus.version, book
+        return book
+
+    def load_corpus(self, source: str, word_length: int = None):
+        """
+        Loads the corpus from the memory-mapped word table of its word length. If the table does not include
+        the source, it is created with the source and the sources already downloaded, unless the factory does
+        not build (see `__init__`)
+        """
+        word_length = self._check_word_length(word_length)
+
+        with self._get_corpus_lock(('tables',)):
+            if (table := self._load_table(word_length)) is None or source not in table[2]['sources']:
+                if not self._build:
+                    raise ValueError(f"the '{source}' corpus with word length {word_length} was not built")
+                return self._build_tables(self._downloaded_sources(source))[source, word_length]
+
+            return self._table_corpus(source, word_length)
+
+    def built_sources(self, word_length: int = None) -> list[str]:
+        """The sources the saved word table of the word length was built with"""
+        word_length = self._check_word_length(word_length)
+
+        with self._get_corpus_lock(('tables',)):
+            return [] if (table := self._load_table(word_length)) is None else list(table[2]['sources'])
+
+    def _load_table(self, word_length: int):
+        """The word table of the word length, loaded if it was saved. The caller holds the tables lock"""
+        if word_length not in self.__word_tables__ and (path := self._word_table_filepath(word_length)).exists():
+            self.__word_tables__[word_length] = WordIndex.load(path)
+
+        return self.__word_tables__.get(word_length)
+
+    def _table_corpus(self, source: str, word_length: int, engine: str = None):
+        index, extra, meta = self.__word_tables__[word_length]
+        corpus = WordCorpus.from_index(index, source, extra.get('frequency'), extra[f'members_{source}'],
+                                       meta.get('version'))
+        corpus.engine = self._engine if engine is None else engine
         return corpus
 
-    def download_word_frequencies(self):
+    def _downloaded_sources(self, *required: str):
+        """The sources whose words were downloaded, with the required sources"""
+        # checks the files without `_get_cache_folder` which would create the folders of every source
+        folder = Path(os.getenv('WORDLE_FOLDER', Path.home())) / ".wordle"
+        return [s for s in self.sources if s in required or (folder / s / 'source.p').exists()]
+
+    def download_word_frequencies(self, force=False):
+        """
+        Downloads the word frequency table. The download is skipped when the table exists and the validators
+        (ETag, Last-Modified) of its url are unchanged
+
+        :param force: download the table even if it is unchanged
+        """
+        import pandas as pd
+        import requests
+
         url = "https://github.com/hermitdave/FrequencyWords/raw/master/content/2018/en/en_full.txt"
+        validators = {url: _remote_validators(url)}
+        if (not force and self._word_frequency_table_filepath().exists() and validators[url]
+                and self._read_build_info().get('validators') == validators):
+            return self.get_word_frequency_table()
+
         resp = requests.get(url)
         if not resp.ok:
             raise requests.exceptions.RequestException(f"Could not get word frequency data from: {url}")
@@ -246,4 +792,39 @@ class CorpusFactory:
                 .reset_index(drop=True))
 
         data.to_pickle(self._word_frequency_table_filepath())
+        self._write_build_info({'sha256': _file_hash(self._word_frequency_table_filepath()), 'words': len(data),
+                                'validators': validators})
+        self.get_word_frequency_table.cache_clear()
+        self.get_word_frequencies.cache_clear()
         return data
+
+
+def _content_hash(words: Iterable[str]) -> str:
+    """Hash of a word set that does not depend on its iteration order"""
+    return hashlib.sha256('\n'.join(sorted(words)).encode()).hexdigest()
+
+
+def _file_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(1 << 20):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _remote_validators(url: str) -> dict[str, str]:
+    """
+    ETag, Last-Modified and Content-Length of the url from a HEAD request. Empty if the request fails or the
+    server sends neither an ETag nor a Last-Modified header, in which case the url cannot be told unchanged
+    """
+    import requests
+
+    try:
+        resp = requests.head(url, allow_redirects=True, timeout=30)
+    except requests.exceptions.RequestException:
+        return {}
+
+    headers = {k: resp.headers[k] for k in ('ETag', 'Last-Modified', 'Content-Length') if k in resp.headers}
+    if not resp.ok or not ({'ETag', 'Last-Modified'} & headers.keys()):
+        return {}
+    return headers
@@ -0,0 +1,80 @@
+from collections import Counter
+from typing import Sequence
+
+from .corpus import WordFilter
+
+ABSENT, PRESENT, CORRECT = 0, 1, 2
+
+
+def score_guess(guess: str, answer: str) -> tuple[int, ...]:
+    """
+    Scores a guess against the answer like Wordle does. Each letter is CORRECT (green), PRESENT (yellow) or
+    ABSENT (grey). Repeated letters are only PRESENT as many times as they occur in the answer
+
+    Examples
+    --------
+    >>> from corpus.feedback import score_guess
+    >>> score_guess('SPEED', 'ABIDE')
+    (0, 0, 1, 0, 1)
+    """
+    guess, answer = guess.upper(), answer.upper()
+    pattern = [ABSENT] * len(guess)
+    remaining = Counter()
+
+    for i, (g, a) in enumerate(zip(guess, answer)):
+        if g == a:
+            pattern[i] = CORRECT
+        else:
+            remaining[a] += 1
+
+    for i, g in enumerate(guess):
+        if pattern[i] != CORRECT and remaining[g] > 0:
+            pattern[i] = PRESENT
+            remaining[g] -= 1
+
+    return tuple(pattern)
+
+
+def encode_pattern(pattern: Sequence[int]) -> int:
+    """Encodes a pattern as a base 3 number where the first letter is the least significant digit"""
+    return sum(p * 3 ** i for i, p in enumerate(pattern))
+
+
+def decode_pattern(code: int, word_length: int) -> tuple[int, ...]:
+    return tuple((code // 3 ** i) % 3 for i in range(word_length))
+
+
+def feedback_filters(rows: Sequence[tuple[str, Sequence[int]]], word_length: int) -> list[WordFilter]:
+    """
+    Builds the filters for a list of (guess, pattern) rows the same way the web client builds its query
+
+    Examples
+    --------
+    >>> from corpus.feedback import feedback_filters
+    >>> feedback_filters([('SPEED', (0, 0, 1, 0, 1))], 5)[2]
+    WordFilter(letter='E', positions=[], exclude_positions=[3], at_least=1, at_most=1)
+    """
+    filters: dict[str, WordFilter] = {}
+
+    for guess, pattern in rows:
+        guess = guess.upper()
+        included = Counter(g for g, p in zip(guess, pattern) if p != ABSENT)
+        excluded = Counter(g for g, p in zip(guess, pattern) if p == ABSENT)
+
+        for pos, (letter, p) in enumerate(zip(guess, pattern), 1):
+            at_least = included[letter]
+            # a grey letter caps the count at the number of green and yellow copies
+            at_most = (word_length if excluded[letter] == 0 else at_least) if at_least > 0 else 0
+
+            if (x := filters.get(letter)) is None:
+                x = filters[letter] = WordFilter(letter, [], [], at_least, at_most)
+            else:
+                x.at_least = max(x.at_least, at_least)
+                x.at_most = min(x.at_most, at_most)
+
+            if p == CORRECT and pos not in x.positions:
+                x.positions.append(pos)
+            elif p == PRESENT and pos not in x.exclude_positions:
+                x.exclude_positions.append(pos)
+
+    return list(filters.values())
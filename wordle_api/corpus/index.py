@@ -0,0 +1,264 @@
+from pathlib import Path
+from typing import Iterable, TYPE_CHECKING
+
+import numpy as np
+
+from .storage import load_arrays, save_arrays
+
+if TYPE_CHECKING:
+    from .corpus import WordFilter
+
+
+class WordIndex:
+    """
+    WordIndex stores a word list as an N x L matrix of letter codes alongside packed bitmasks for every
+    (position, letter) and (letter, count) pair. Each WordFilter then becomes a handful of vectorized
+    AND / AND NOT operations over the bitmasks instead of Python set operations.
+
+    Words are identified by their position (id) in the sorted word list.
+
+    Examples
+    --------
+    >>> from corpus.index import WordIndex
+    >>> index = WordIndex.from_words({'SCOTT', 'START', 'STEAL'}, 5)
+    >>> index.words_of(index.filter([]))
+    ['SCOTT', 'START', 'STEAL']
+    """
+
+    def __init__(self, word_length: int, words: np.ndarray, alphabet: np.ndarray, letters: np.ndarray,
+                 position_masks: np.ndarray, count_masks: np.ndarray):
+        """
+        Use `WordIndex.from_words` to build an index or `WordIndex.load` to open a saved one
+
+        :param word_length: length of the words
+        :param words: sorted array of the words
+        :param alphabet: sorted array of the distinct letters in the words
+        :param letters: N x L matrix of letter codes (indices into the alphabet)
+        :param position_masks: packed bitmasks where position_masks[pos, letter] are the words with the
+            letter at the (0-based) position
+        :param count_masks: packed bitmasks where count_masks[letter, count] are the words with exactly
+            count occurrences of the letter
+        """
+        self._word_length = word_length
+        self._words = words
+        self._size = len(words)
+        self._alphabet = alphabet
+        self._codes: dict[str, int] = {c: i for i, c in enumerate(alphabet.tolist())}
+        self._letters = letters
+        self._position_masks = position_masks
+        self._count_masks = count_masks
+
+        self._all = np.packbits(np.ones(self._size, dtype=bool))
+        self._none = np.zeros_like(self._all)
+
+    @classmethod
+    def from_words(cls, words: Iterable[str], word_length: int):
+        """Creates the index from a collection of upper-cased words of the same length"""
+        if not (isinstance(word_length, int) and word_length > 0):
+            raise ValueError("word length must be a positive integer")
+
+        words = np.array(sorted(words), dtype=f'U{word_length}')
+        size = len(words)
+
+        chars = words.view('U1').reshape(size, word_length)
+        alphabet = np.unique(chars)
+        if len(alphabet) > np.iinfo(np.uint8).max:
+            raise ValueError(f"too many distinct letters in corpus: {len(alphabet)}")
+
+        letters = np.searchsorted(alphabet, chars).astype(np.uint8).reshape(size, word_length)
+
+        n_letters = len(alphabet)
+        n_bytes = (size + 7) // 8
+
+        position_masks = np.zeros((word_length, n_letters, n_bytes), dtype=np.uint8)
+        for pos in range(word_length):
+            column = letters[:, pos]
+            for code in range(n_letters):
+                position_masks[pos, code] = np.packbits(column == code)
+
+        count_masks = np.zeros((n_letters, word_length + 1, n_bytes), dtype=np.uint8)
+        for code in range(n_letters):
+            counts = (letters == code).sum(axis=1)
+            for num in range(word_length + 1):
+                count_masks[code, num] = np.packbits(counts == num)
+
+        return cls(word_length, words, alphabet, letters, position_masks, count_masks)
+
+    def save(self, path: Path, extra: dict[str, np.ndarray] = None, meta: dict = None):
+        """
+        Saves the index as a memory-mappable binary file
+
+        :param path: file path
+        :param extra: additional arrays stored alongside the index, for example word frequencies
+        :param meta: additional JSON serializable metadata
+        """
+        save_arrays(path,
+                    {**(extra or {}),
+                     'words': self._words,
+                     'alphabet': self._alphabet,
+                     'letters': self._letters,
+                     'position_masks': self._position_masks,
+                     'count_masks': self._count_masks},
+                    {**(meta or {}), 'word_length': self._word_length})
+
+    @classmethod
+    def load(cls, path: Path) -> tuple['WordIndex', dict[str, np.ndarray], dict]:
+        """
+        Memory-maps an index saved with `WordIndex.save`. Returns the index, the extra arrays and the metadata
+        """
+        arrays, meta = load_arrays(path)
+        index = cls(meta['word_length'],
+                    arrays.pop('words'),
+                    arrays.pop('alphabet'),
+                    arrays.pop('letters'),
+                    arrays.pop('position_masks'),
+                    arrays.pop('count_masks'))
+        return index, arrays, meta
+
+    @property
+    def word_length(self):
+        return self._word_length
+
+    @property
+    def words(self) -> np.ndarray:
+        return self._words
+
+    @property
+    def letters(self) -> np.ndarray:
+        return self._letters
+
+    def __len__(self):
+        return self._size
+
+    def __contains__(self, word: str):
+        return self.find(word) is not None
+
+    def find(self, word: str) -> int | None:
+        """Returns the id of the word, or None if it is not in the index"""
+        i = int(np.searchsorted(self._words, word))
+        if i < self._size and self._words[i] == word:
+            return i
+        return None
+
+    def mask_of(self, words: Iterable[str]) -> np.ndarray:
+        """Returns the packed bitmask of the words. Every word must be in the index"""
+        words = np.array(sorted(words), dtype=str)
+        ids = np.searchsorted(self._words, words)
+        if len(words) and (ids.max() >= self._size or (self._words[ids] != words).any()):
+            raise ValueError("every word of the mask must be in the index")
+
+        selected = np.zeros(self._size, dtype=bool)
+        selected[ids] = True
+        return np.packbits(selected)
+
+    def filter(self, filters: list['WordFilter'], within: np.ndarray = None) -> np.ndarray:
+        """
+        Returns the sorted ids of the words that satisfy all the filters
+
+        :param filters: a list of WordFilter to apply
+        :param within: packed bitmask of the words to consider, for example the members of a corpus. All the
+            words are considered if None
+        """
+        mask = self.mask(filters)
+        if within is not None:
+            mask &= within
+        return self.ids_of(mask)
+
+    def mask(self, filters: list['WordFilter']) -> np.ndarray:
+        """Returns the packed bitmask of the words that satisfy all the filters"""
+        mask = self._all.copy()
+        grey = []
+
+        for x in filters:
+            for pos in x.positions:
+                mask &= self._position_mask(pos, x.letter)
+
+            for pos in x.exclude_positions:
+                mask &= ~self._position_mask(pos, x.letter)
+
+            if x.at_least > 0:
+                mask &= self._count_mask(x.letter, x.at_least, x.at_most)
+            elif x.at_most == 0:
+                grey.append(x.letter)
+
+        if grey:
+            mask &= self._absent_mask(grey)
+
+        return mask
+
+    def narrow(self, ids: np.ndarray, filters: list['WordFilter']) -> np.ndarray:
+        """
+        Applies the filters to a subset of words given by their ids. Unlike `filter`, the cost is proportional
+        to the number of ids and not to the size of the index
+
+        :param ids: sorted ids of the candidate words, usually from a previous `filter` or `narrow` call
+        :param filters: a list of WordFilter to apply
+        """
+        letters = self._letters[ids]
+        keep = np.ones(len(ids), dtype=bool)
+        grey = []
+
+        for x in filters:
+            code = self._codes.get(x.letter)
+
+            for pos in x.positions:
+                self._check_position(pos, x.letter)
+                if code is None:
+                    keep[:] = False
+                else:
+                    keep &= letters[:, pos - 1] == code
+
+            for pos in x.exclude_positions:
+                self._check_position(pos, x.letter)
+                if code is not None:
+                    keep &= letters[:, pos - 1] != code
+
+            if x.at_least > 0:
+                self._check_count(x.letter, x.at_least, x.at_most)
+                counts = (letters == code).sum(axis=1) if code is not None else np.zeros(len(ids), dtype=int)
+                keep &= (counts >= x.at_least) & (counts <= x.at_most)
+            elif x.at_most == 0 and code is not None:
+                grey.append(code)
+
+        if grey:
+            keep &= ~np.isin(letters, grey).any(axis=1)
+
+        return ids[keep]
+
+    def words_of(self, ids: np.ndarray) -> list[str]:
+        """Maps word ids back to the words"""
+        return self._words[ids].tolist()
+
+    def ids_of(self, mask: np.ndarray) -> np.ndarray:
+        """Returns the sorted ids of the words in a packed bitmask"""
+        return np.flatnonzero(np.unpackbits(mask, count=self._size))
+
+    def _check_position(self, position: int, letter: str):
+        if not (1 <= position <= self._word_length):
+            raise ValueError(f"letter '{letter}' position must be between [1, {self._word_length}]. Got {position}")
+
+    def _check_count(self, letter: str, min_count: int, max_count: int):
+        if not (0 <= min_count <= max_count <= self._word_length):
+            raise ValueError(f"letter '{letter}' min_count and max_count must be between [0, {self._word_length}] and min_count must be <= max_count. "
+                             f"Got min_count={min_count} and max_count={max_count}")
+
+    def _position_mask(self, position: int, letter: str):
+        self._check_position(position, letter)
+
+        if (code := self._codes.get(letter)) is None:
+            return self._none
+        return self._position_masks[position - 1, code]
+
+    def _count_mask(self, letter: str, min_count: int, max_count: int):
+        self._check_count(letter, min_count, max_count)
+
+        if (code := self._codes.get(letter)) is None:
+            return self._all if min_count == 0 else self._none
+        return np.bitwise_or.reduce(self._count_masks[code, min_count:max_count + 1], axis=0)
+
+    def _absent_mask(self, letters: list[str]):
+        """Bitmask of the words that contain none of the letters, in a single reduction over the count masks"""
+        codes = [code for x in letters if (code := self._codes.get(x)) is not None]
+        if not codes:
+            return self._all
+        return np.bitwise_and.reduce(self._count_masks[codes, 0], axis=0)
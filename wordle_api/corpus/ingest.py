@@ -0,0 +1,94 @@
+import os
+import tempfile
+import zipfile
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable
+
+import requests
+
+CHUNK_SIZE = 1 << 20
+
+
+@contextmanager
+def spool(url: str, chunk_size: int = CHUNK_SIZE):
+    """
+    Streams the url into a temporary file and yields its path. The file is removed on exit
+
+    Examples
+    --------
+    >>> from corpus.ingest import spool
+    >>> with spool('https://www.corpusdata.org/coca/samples/coca-samples-wlp.zip') as path:  # doctest: +SKIP
+    ...     print(path.stat().st_size)
+    """
+    fd, name = tempfile.mkstemp(suffix='.download')
+    path = Path(name)
+    try:
+        # the file owns the descriptor from here, so it is closed even if the download fails
+        with os.fdopen(fd, 'wb') as f, requests.get(url, stream=True) as resp:
+            if not resp.ok:
+                raise requests.exceptions.RequestException(f"Could not get corpus data from: {url}")
+
+            for chunk in resp.iter_content(chunk_size):
+                f.write(chunk)
+
+        yield path
+    finally:
+        path.unlink(missing_ok=True)
+
+
+def read_zip_words(path: Path, word_lengths: Iterable[int] = None, pool: Executor = None) -> set[str]:
+    """
+    Collects the alphabetic tab separated tokens of every .txt member in the zip file. Members are
+    tokenized in parallel by the pool's workers and their partial word sets merged
+
+    :param path: path of the zip file
+    :param word_lengths: only keep words of these lengths. Keeps words of any length if None
+    :param pool: executor used to process the members. A process pool is created if None
+    """
+    lengths = None if word_lengths is None else frozenset(word_lengths)
+
+    with zipfile.ZipFile(path) as zf:
+        members = [info.filename for info in zf.infolist() if info.filename.endswith('.txt')]
+
+    own_pool = pool is None
+    pool = ProcessPoolExecutor() if own_pool else pool
+    try:
+        words = set()
+        for partial in pool.map(read_member_words, [path] * len(members), members, [lengths] * len(members)):
+            words |= partial
+        return words
+    finally:
+        if own_pool:
+            pool.shutdown()
+
+
+def read_member_words(path: Path, member: str, lengths: frozenset[int] | None) -> set[str]:
+    """Tokenizes one zip member in chunks. Module level so that it can run in a process pool"""
+    tokens: set[bytes] = set()
+    with zipfile.ZipFile(path) as zf, zf.open(member) as f:
+        for chunk in iter_token_chunks(f):
+            tokens |= filter_tokens(chunk, lengths)
+
+    # bytes.isalpha only accepts ASCII letters so decoding cannot fail
+    return {token.upper().decode() for token in tokens}
+
+
+def iter_token_chunks(f, chunk_size: int = CHUNK_SIZE):
+    """Reads a binary file in chunks that end on a token boundary (tab or newline)"""
+    remainder = b''
+    while chunk := f.read(chunk_size):
+        chunk = remainder + chunk
+        end = max(chunk.rfind(b'\n'), chunk.rfind(b'\t')) + 1
+        chunk, remainder = chunk[:end], chunk[end:]
+        yield chunk
+
+    if remainder:
+        yield remainder
+
+
+def filter_tokens(chunk: bytes, lengths: frozenset[int] | None) -> set[bytes]:
+    """Splits the chunk on tabs and newlines and keeps the alphabetic tokens of the given lengths"""
+    tokens = {token.strip() for token in chunk.replace(b'\n', b'\t').split(b'\t')}
+    return {t for t in tokens if t.isalpha() and (lengths is None or len(t) in lengths)}
@@ -1,17 +1,35 @@
 from collections import Counter
+from typing import TYPE_CHECKING
 
-import pandas as pd
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+    from .corpus import WordCorpus
 
 
 class WordRanker:
-    def __init__(self, word_length: int, frequency_table: pd.DataFrame):
+    def __init__(self, word_length: int, frequency_table: 'pd.DataFrame' = None):
+        """
+        Ranks candidate words
+
+        :param word_length: length of the words to rank
+        :param frequency_table: word frequency table used by `partition_score`. Not needed by `rank` which
+            uses the frequencies attached to the corpus
+        """
         self._word_length = word_length
-        self._frequency = (frequency_table[frequency_table['word'].str.len() == 5]
-                           .set_index('word')['frequency']
-                           .rename(index=str.upper)
-                           .to_dict())
+        self._frequency: dict[str, int] = {}
+        if frequency_table is not None:
+            self._frequency = (frequency_table[frequency_table['word'].str.len() == word_length]
+                               .set_index('word')['frequency']
+                               .rename(index=str.upper)
+                               .to_dict())
+
+    def partition_score(self, words: set[str], k: int = None):
+        # pandas is only needed by this legacy path, `rank` serves requests without it
+        import pandas as pd
 
-    def partition_score(self, words: set[str]):
         _scores = {w: 1 for w in words}
 
         for i in range(self._word_length):
@@ -27,4 +45,79 @@ class WordRanker:
                                 .reset_index())
 
         scores['frequency'] = scores['word'].map(self._frequency).fillna(0).astype(int)
+        if k is not None and k < len(scores):
+            return scores.nlargest(k, ['frequency', 'partition']).reset_index(drop=True)
         return scores.sort_values(['frequency', 'partition'], ascending=False).reset_index(drop=True)
+
+    def rank(self, corpus: 'WordCorpus', ids: np.ndarray, k: int = None) -> list[dict]:
+        """
+        Array based equivalent of `partition_score`. Ranks the words given by their ids in the corpus' index
+        and returns records sorted by frequency and partition score in descending order
+
+        :param corpus: a corpus using the 'bitset' engine
+        :param ids: ids of the candidate words, usually from `WordCorpus.get_potential_word_ids`
+        :param k: if specified, only the top k records are returned. The top k are found with a partial
+            selection so only k records are sorted and materialized
+        """
+        columns = self.rank_columns(corpus, ids, k)
+        return [{'word': w, 'partition': p, 'frequency': f}
+                for w, p, f in zip(columns['word'], columns['partition'], columns['frequency'])]
+
+    def rank_columns(self, corpus: 'WordCorpus', ids: np.ndarray, k: int = None) -> dict[str, list]:
+        """
+        Same as `rank` but returns the columns of the records, {'word': [...], 'partition': [...], 'frequency': [...]},
+        which skips building a dict per record
+        """
+        ranked, partition, frequency = self.rank_ids(corpus, ids, k)
+        return {'word': corpus.index.words_of(ranked),
+                'partition': partition.tolist(),
+                'frequency': frequency.tolist()}
+
+    def rank_ids(self, corpus: 'WordCorpus', ids: np.ndarray, k: int = None) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Same as `rank_columns` but returns the ranked ids with their partition scores and frequencies as arrays.
+        The top k are the first k ids of the full ranking
+        """
+        index = corpus.index
+        letters = index.letters[ids]
+        n_letters = int(letters.max()) + 1 if len(ids) else 0
+
+        scores = np.ones(len(ids))
+        for i in range(index.word_length):
+            column = letters[:, i]
+            counts = np.bincount(column, minlength=n_letters)
+            present = counts > 0
+
+            pos_score = np.zeros(n_letters)
+            pos_score[present] = _average_rank(counts[present])
+            scores *= pos_score[column]
+
+        partition = _average_rank(scores).astype(np.int64)
+        frequency = corpus.frequency[ids]
+
+        selected = _top_k(frequency, partition, k)
+
+        # lexsort is stable, ties are kept in word order
+        order = selected[np.lexsort((-partition[selected], -frequency[selected]))]
+        return ids[order], partition[order], frequency[order]
+
+
+def _top_k(frequency: np.ndarray, partition: np.ndarray, k: int | None):
+    """Positions of the top k (frequency, partition) pairs in ascending position order"""
+    n = len(frequency)
+    if k is None or k >= n:
+        return np.arange(n)
+
+    # partition is at most n, so the combined key orders by frequency then partition
+    key = frequency * (n + 1) + partition
+    threshold = np.partition(key, n - k)[n - k]
+    above = np.flatnonzero(key > threshold)
+    ties = np.flatnonzero(key == threshold)[:k - len(above)]
+    return np.sort(np.concatenate([above, ties]))
+
+
+def _average_rank(values: np.ndarray):
+    """Ranks values in ascending order, tied values get the average of their ranks. Same as `pd.Series.rank()`"""
+    _, inverse, counts = np.unique(values, return_inverse=True, return_counts=True)
+    ends = np.cumsum(counts)
+    return ((ends - counts + 1 + ends) / 2)[inverse]
@@ -0,0 +1,126 @@
+from pathlib import Path
+
+import numpy as np
+
+from .feedback import CORRECT, PRESENT
+from .storage import atomic_write
+
+METHODS = ('entropy', 'minimax')
+
+
+def pattern_dtype(word_length: int):
+    """Smallest unsigned integer type that holds every encoded feedback pattern of the word length"""
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if 3 ** word_length - 1 <= np.iinfo(dtype).max:
+            return dtype
+    raise ValueError(f"feedback patterns of {word_length} letter words do not fit in 32 bits")
+
+
+def feedback_matrix(letters: np.ndarray) -> np.ndarray:
+    """
+    Computes the guess x answer matrix of encoded feedback patterns (see `corpus.feedback.encode_pattern`)
+    where every word is both a guess and an answer. Each guess is scored against all the answers at once
+
+    :param letters: N x L matrix of the letter codes of the words, such as `WordIndex.letters`
+
+    Examples
+    --------
+    >>> from corpus.feedback import encode_pattern, score_guess
+    >>> from corpus.index import WordIndex
+    >>> index = WordIndex.from_words({'ABIDE', 'SPEED', 'EERIE'}, 5)
+    >>> m = feedback_matrix(index.letters)
+    >>> words = index.words.tolist()
+    >>> all(m[i, j] == encode_pattern(score_guess(g, a)) for i, g in enumerate(words) for j, a in enumerate(words))
+    True
+    """
+    n, word_length = letters.shape
+    columns = np.ascontiguousarray(letters.T)  # L x N
+    n_letters = int(columns.max()) + 1 if n else 0
+    # counts[letter] is the number of copies of the letter in each answer
+    counts = np.stack([(columns == code).sum(axis=0) for code in range(n_letters)]).astype(np.int8) if n else None
+    weights = 3 ** np.arange(word_length)
+
+    matrix = np.empty((n, n), dtype=pattern_dtype(word_length))
+    code = np.empty(n, dtype=np.int64)
+
+    for i, guess in enumerate(letters.tolist()):
+        greens = columns == np.array(guess, dtype=np.uint8)[:, None]
+        code[:] = 0
+
+        positions: dict[int, list[int]] = {}
+        for j, letter in enumerate(guess):
+            positions.setdefault(letter, []).append(j)
+
+        for letter, js in positions.items():
+            # copies of the letter in the answer that are not matched by a green, claimed by yellows from the left
+            available = counts[letter] - greens[js].sum(axis=0, dtype=np.int8)
+            for j in js:
+                yellow = ~greens[j] & (available > 0)
+                code += greens[j] * (CORRECT * weights[j]) + yellow * (PRESENT * weights[j])
+                if len(js) > 1:
+                    available -= yellow
+
+        matrix[i] = code
+
+    return matrix
+
+
+def save_feedback_matrix(path: Path, matrix: np.ndarray):
+    with atomic_write(path) as f:
+        np.save(f, matrix)
+
+
+def load_feedback_matrix(path: Path) -> np.ndarray:
+    """Memory-maps a matrix saved by `save_feedback_matrix`"""
+    return np.load(path, mmap_mode='r')
+
+
+def best_guesses(matrix: np.ndarray, candidates: np.ndarray, k: int = 10, method: str = 'entropy',
+                 n_patterns: int = None, max_cells: int = 1 << 22):
+    """
+    Scores every word as a guess against the remaining candidates by counting the candidates in each
+    feedback bucket. Only the columns of the candidates are read from the matrix
+
+    :param matrix: guess x answer feedback matrix from `feedback_matrix`
+    :param candidates: sorted ids of the remaining candidate answers
+    :param k: number of guesses to return
+    :param method: 'entropy' ranks by the expected information of the feedback, 'minimax' by the size of
+        the largest bucket
+    :param n_patterns: number of distinct patterns, 3 ** word_length. Read from the matrix if None
+    :param max_cells: maximum number of matrix cells processed at once, bounds the working memory
+    :return: ids of the best guesses with their entropy and largest bucket size
+    """
+    if method not in METHODS:
+        raise ValueError(f"invalid method: '{method}'. Use one of {METHODS}")
+
+    n_guesses, n_candidates = matrix.shape[0], len(candidates)
+    if n_candidates == 0:
+        empty = np.empty(0)
+        return empty.astype(np.int64), empty, empty.astype(np.int64)
+
+    if n_patterns is None:
+        n_patterns = int(matrix.max()) + 1 if n_guesses else 1
+    entropy = np.empty(n_guesses)
+    max_bucket = np.empty(n_guesses, dtype=np.int64)
+
+    rows = max(1, max_cells // max(n_candidates, n_patterns))
+    for start in range(0, n_guesses, rows):
+        block = np.asarray(matrix[start:start + rows, candidates], dtype=np.int64)
+        offsets = np.arange(len(block))[:, None] * n_patterns
+        counts = np.bincount((block + offsets).ravel(), minlength=len(block) * n_patterns).reshape(len(block), n_patterns)
+
+        p = counts / n_candidates
+        with np.errstate(divide='ignore', invalid='ignore'):
+            entropy[start:start + rows] = -np.where(counts > 0, p * np.log2(p), 0).sum(axis=1)
+        max_bucket[start:start + rows] = counts.max(axis=1)
+
+    # prefer guesses that could be the answer, then keep word order
+    is_candidate = np.zeros(n_guesses, dtype=bool)
+    is_candidate[candidates] = True
+    if method == 'entropy':
+        order = np.lexsort((~is_candidate, max_bucket, -entropy))
+    else:
+        order = np.lexsort((~is_candidate, -entropy, max_bucket))
+
+    top = order[:k]
+    return top, entropy[top], max_bucket[top]
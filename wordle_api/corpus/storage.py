@@ -0,0 +1,97 @@
+import json
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+
+MAGIC = b'WORDLEIX'
+VERSION = 1
+ALIGNMENT = 64
+
+
+def save_arrays(path: Path, arrays: dict[str, np.ndarray], meta: dict = None):
+    """
+    Saves arrays into a single binary file that can be memory-mapped with `load_arrays`.
+
+    The file starts with MAGIC, the length of a JSON header (8 bytes, little endian) and the header itself.
+    The header records the metadata and the dtype, shape and offset of each array. Arrays are written as
+    raw C-ordered bytes, each aligned to 64 bytes. The file is written with `atomic_write`, so readers never see
+    a partially written file.
+    """
+    arrays = {name: np.ascontiguousarray(a) for name, a in arrays.items()}
+
+    # the header length affects the offsets, which are part of the header. Lay the arrays out after the
+    # header until the header fits in front of the first array
+    base, header, layout = 0, b'', {}
+    while _align(len(MAGIC) + 8 + len(header)) > base:
+        base = _align(len(MAGIC) + 8 + len(header))
+        offset, layout = base, {}
+        for name, a in arrays.items():
+            layout[name] = {'dtype': a.dtype.str, 'shape': list(a.shape), 'offset': offset}
+            offset = _align(offset + a.nbytes)
+        header = json.dumps({'version': VERSION, 'meta': meta or {}, 'arrays': layout}).encode()
+
+    with atomic_write(path) as f:
+        f.write(MAGIC)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        for name, a in arrays.items():
+            if (padding := layout[name]['offset'] - f.tell()) < 0:
+                raise RuntimeError(f"array '{name}' was laid out at {layout[name]['offset']} before the end of the data")
+            f.write(b'\0' * padding)
+            f.write(a.tobytes())
+
+
+@contextmanager
+def atomic_write(path: Path, mode: str = 'wb'):
+    """
+    Opens a temporary file next to the path and moves it over the path once it is written. Each call gets a
+    temporary file of its own, so processes writing the same path at once do not clobber each other's file and
+    readers only ever see a complete file, from the last writer
+    """
+    path = Path(path)
+    f = tempfile.NamedTemporaryFile(mode, dir=path.parent, prefix=f".{path.name}.", suffix='.tmp', delete=False)
+    try:
+        with f:
+            # temporary files are only readable by their owner
+            os.fchmod(f.fileno(), 0o644)
+            yield f
+        os.replace(f.name, path)
+    except BaseException:
+        Path(f.name).unlink(missing_ok=True)
+        raise
+
+
+def load_arrays(path: Path) -> tuple[dict[str, np.ndarray], dict]:
+    """
+    Memory-maps a file written by `save_arrays`. The returned arrays are read-only views over the mapped
+    file, so loading takes constant time and processes mapping the same file share its pages
+    """
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if buffer[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a wordle index file")
+
+    start = len(MAGIC) + 8
+    header = json.loads(buffer[start:start + int.from_bytes(buffer[len(MAGIC):start], 'little')])
+    if header['version'] != VERSION:
+        raise ValueError(f"{path} has version {header['version']}, expected {VERSION}")
+
+    arrays = {}
+    for name, spec in header['arrays'].items():
+        dtype, shape = np.dtype(spec['dtype']), tuple(spec['shape'])
+        count = int(np.prod(shape))
+        if count == 0:
+            arrays[name] = np.empty(shape, dtype=dtype)
+        else:
+            arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=spec['offset']).reshape(shape)
+
+    return arrays, header['meta']
+
+
+def _align(offset: int):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
@@ -1,13 +1,19 @@
-from importlib import import_module
-from pathlib import Path
-from pkgutil import iter_modules
+import asyncio
+import logging
+import os
+import secrets
+import signal
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from starlette.requests import Request
 
-from .utils import project_root
+from .executor import ExecutorSaturated
+from .ext import CompressionMiddleware
+from .metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
 
 
 def create_app():
@@ -16,6 +22,8 @@ def create_app():
             .add_error_handlers()
             .add_events()
             .add_healthcheck()
+            .add_metrics()
+            .add_admin()
             .add_middleware()
             .create_app())
 
@@ -28,14 +36,10 @@ class AppBuilder:
                             redoc_url="/docs")
 
     def add_api_routes(self):
-        root_dir = project_root()
-        router_dir = Path(__file__).parent / "routers"
+        # routers are registered explicitly instead of being discovered by importing every package
+        from .routers.hint.router import router as hint_router
 
-        for submodule in iter_modules([router_dir.as_posix()]):
-            if submodule.ispkg and (router_file := router_dir / submodule.name / "router.py").exists():
-                module = import_module('.'.join(router_file.relative_to(root_dir).parts).replace('.py', ''))
-                if hasattr(module, 'router'):
-                    self._app.include_router(module.router, prefix=f"/api/{submodule.name.replace('_', '-')}")
+        self._app.include_router(hint_router, prefix="/api/hint")
 
         return self
 
@@ -44,33 +48,123 @@ class AppBuilder:
         async def catch_general_errors_handler(_: Request, exc: ValueError):
             return JSONResponse(status_code=400, content={"error": str(exc)})
 
+        @self._app.exception_handler(ExecutorSaturated)
+        async def executor_saturated_handler(_: Request, exc: ExecutorSaturated):
+            return JSONResponse(status_code=503, content={"error": str(exc)}, headers={"Retry-After": "1"})
+
         return self
 
     def add_events(self):
+        self._app.state.ready = False
+
         @self._app.on_event("startup")
         async def startup():
-            pass
+            # warm up in the background so that the healthcheck can report progress
+            self._app.state.warm_up = asyncio.get_running_loop().run_in_executor(None, self._warm_up)
+            if hasattr(signal, 'SIGHUP'):
+                try:
+                    asyncio.get_running_loop().add_signal_handler(signal.SIGHUP, self._schedule_reload)
+                except (NotImplementedError, RuntimeError):
+                    # signal handlers can only be added on the main thread
+                    logger.warning("could not reload corpus data on SIGHUP")
 
         @self._app.on_event("shutdown")
         async def shutdown():
-            pass
+            from .routers.hint.executor import EXECUTOR
+            EXECUTOR.shutdown()
 
         return self
 
     def add_healthcheck(self):
         @self._app.get("/_healthcheck")
         def healthcheck():
+            if not self._app.state.ready:
+                return JSONResponse({"status": "Loading"}, status_code=503)
             return JSONResponse({"status": "Okay"})
 
         return self
 
+    def add_metrics(self):
+        @self._app.get("/_metrics", response_class=PlainTextResponse)
+        def metrics():
+            return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+        return self
+
+    def add_admin(self):
+        self._app.state.reloading = None
+
+        @self._app.post("/_admin/reload", status_code=202)
+        async def reload(request: Request, refresh: bool = False):
+            """
+            Reloads the corpus data in the background, like sending SIGHUP to the server. With refresh, the
+            sources whose content changed are downloaded and the word tables built again first.
+
+            Requires the WORDLE_ADMIN_TOKEN environment variable in the X-Admin-Token header, the endpoint is
+            disabled if the variable is not set
+            """
+            token = os.getenv('WORDLE_ADMIN_TOKEN')
+            if not token or not secrets.compare_digest(request.headers.get('X-Admin-Token', '').encode(), token.encode()):
+                return JSONResponse({"error": "admin token is missing or invalid"}, status_code=403)
+
+            started = self._schedule_reload(refresh)
+            return JSONResponse({"status": "Reloading" if started else "Already reloading"}, status_code=202)
+
+        return self
+
+    def _schedule_reload(self, refresh=False):
+        """Starts reloading the corpus data unless a reload is running. Must be called from the event loop"""
+        if (task := self._app.state.reloading) is not None and not task.done():
+            return False
+
+        async def reload():
+            from .routers.hint.executor import EXECUTOR
+
+            if await asyncio.get_running_loop().run_in_executor(None, self._reload, refresh):
+                # process pool workers load the new data on start
+                EXECUTOR.restart()
+
+        self._app.state.reloading = asyncio.create_task(reload())
+        return True
+
+    def _reload(self, refresh: bool):
+        """Swaps in the word tables saved since they were loaded. Returns the versions of the reloaded word lengths"""
+        from .routers.hint.constants import FACTORY, OPENERS, SOLVER_MAX_WORDS
+
+        try:
+            before = {n: FACTORY.data_version(n) for n in FACTORY.word_lengths}
+            if refresh:
+                FACTORY.recreate_data_files(openers=OPENERS, solver_max_words=SOLVER_MAX_WORDS)
+            FACTORY.reload()
+
+            reloaded = {n: version for n in FACTORY.word_lengths if (version := FACTORY.data_version(n)) != before[n]}
+            logger.info("reloaded corpus data: %s", reloaded or "unchanged")
+            return reloaded
+        except Exception:
+            logger.exception("could not reload corpus data")
+            return {}
+
+    def _warm_up(self):
+        from .routers.hint.constants import FACTORY, PRELOAD
+
+        try:
+            FACTORY.preload(PRELOAD)
+        except Exception:
+            # corpora that failed to load are loaded again on their first request
+            logger.exception("could not preload corpora")
+        finally:
+            self._app.state.ready = True
+
     def add_middleware(self):
+        # responses below the size are not compressed, compressing them costs more than it saves
+        self._app.add_middleware(CompressionMiddleware, minimum_size=int(os.getenv('WORDLE_COMPRESS_MIN_SIZE', 1024)))
         self._app.add_middleware(
             CORSMiddleware,
             allow_origins=['*'],
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["X-Hint-Token", "ETag"],
         )
 
         return self
@@ -0,0 +1,102 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+
+from .metrics import REGISTRY
+
+BACKENDS = ('inline', 'thread', 'process')
+
+
+class ExecutorSaturated(Exception):
+    """Raised when too many tasks are already waiting for the executor"""
+
+
+class TaskExecutor:
+    def __init__(self, backend: str = 'thread', workers: int = None, max_pending: int = 64,
+                 initializer: Callable = None, initargs: tuple = ()):
+        """
+        Runs CPU bound tasks away from the event loop
+
+        :param backend: 'inline' runs tasks on the event loop, 'thread' in a thread pool and 'process' in a
+            process pool
+        :param workers: number of pool workers. Defaults to the number of CPUs
+        :param max_pending: maximum number of tasks running or queued at once. Further tasks are rejected
+            with ExecutorSaturated so that latency stays bounded under bursts
+        :param initializer: called once in each process pool worker, for example to preload data
+        :param initargs: arguments to the initializer
+        """
+        if backend not in BACKENDS:
+            raise ValueError(f"invalid executor backend: '{backend}'. Use one of {BACKENDS}")
+        if not (isinstance(max_pending, int) and max_pending > 0):
+            raise ValueError("max_pending must be a positive integer")
+
+        self._backend = backend
+        self._workers = workers or os.cpu_count()
+        self._max_pending = max_pending
+        self._initializer = initializer
+        self._initargs = initargs
+        self._pool: Executor | None = None
+        self._pending = 0
+
+    @property
+    def backend(self):
+        return self._backend
+
+    @property
+    def pending(self):
+        return self._pending
+
+    async def run(self, func: Callable, *args: Any):
+        """Runs func(*args) on the backend. Must be called from the event loop"""
+        if self._pending >= self._max_pending:
+            raise ExecutorSaturated(f"server is busy with {self._pending} pending requests, try again later")
+
+        self._pending += 1
+        try:
+            if self._backend == 'inline':
+                return func(*args)
+            if self._backend == 'thread':
+                return await asyncio.get_running_loop().run_in_executor(self._get_pool(), partial(func, *args))
+
+            result, metrics = await asyncio.get_running_loop().run_in_executor(self._get_pool(), partial(_run_collecting, func, *args))
+            REGISTRY.merge(metrics)
+            return result
+        finally:
+            self._pending -= 1
+
+    def restart(self):
+        """
+        Replaces the pool so that the next tasks run on new workers, for example for process pool workers to
+        load reloaded data. Tasks already submitted finish on the previous pool
+        """
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            pool.shutdown(wait=False)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _get_pool(self):
+        if self._pool is None:
+            if self._backend == 'process':
+                self._pool = ProcessPoolExecutor(self._workers, initializer=_init_worker,
+                                                 initargs=(self._initializer, self._initargs))
+            else:
+                self._pool = ThreadPoolExecutor(self._workers, thread_name_prefix='task-executor')
+        return self._pool
+
+
+def _init_worker(initializer: Callable | None, initargs: tuple):
+    # forked workers inherit the metrics of the main process, which must not be sent back to it
+    REGISTRY.drain()
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _run_collecting(func: Callable, *args: Any):
+    """Runs func in a process pool worker and returns its result with the metrics recorded by the worker since"""
+    return func(*args), REGISTRY.drain()
@@ -1,2 +1,6 @@
+from .compression import CompressionMiddleware
+from .etag import etag_matches, make_etag
 from .model import CamelModel
+from .response import FastJSONResponse, dumps
+from .route import TimedRoute
 from .router import APIRouter
@@ -0,0 +1,159 @@
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/x-ndjson', 'application/javascript')
+
+
+class CompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        """
+        Compresses responses with brotli, if it is installed and accepted by the client, or gzip.
+
+        Unlike starlette's GZipMiddleware, the ETag of a compressed response gets the encoding as a suffix so
+        that it stays a strong validator of the bytes sent (see `server.ext.etag.etag_matches`), and so does
+        the ETag of a 304 revalidating a compressed response. Streamed responses are flushed chunk by chunk so
+        that clients still receive each chunk as it is produced
+
+        :param app: the ASGI app
+        :param minimum_size: responses sent in one piece that are smaller are not compressed
+        :param gzip_level: gzip compression level
+        :param brotli_quality: brotli quality. Low qualities compress almost as well as gzip's default, faster
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope['type'] != 'http' or (encoding := self._choose(Headers(scope=scope).get('accept-encoding', ''))) is None:
+            await self.app(scope, receive, send)
+            return
+
+        await _Responder(self, encoding, send, Headers(scope=scope).get('if-none-match')).run(scope, receive)
+
+    @staticmethod
+    def _choose(accept_encoding: str) -> str | None:
+        accepted = set()
+        for item in accept_encoding.split(','):
+            name, *params = item.split(';')
+            q = 1.0
+            for param in params:
+                key, _, value = param.partition('=')
+                if key.strip() == 'q':
+                    try:
+                        q = float(value)
+                    except ValueError:
+                        q = 0.0
+            if q > 0:
+                accepted.add(name.strip().lower())
+
+        if brotli is not None and 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return None
+
+    def _compressor(self, encoding: str):
+        if encoding == 'br':
+            return _Brotli(self.brotli_quality)
+        return _Gzip(self.gzip_level)
+
+
+class _Responder:
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send, if_none_match: str = None):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.if_none_match = if_none_match
+        self.start: Message | None = None
+        self.compressor = None
+
+    async def run(self, scope: Scope, receive: Receive):
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message):
+        if message['type'] == 'http.response.start':
+            # held back until the first body chunk tells whether the response is compressed
+            self.start = message
+            return
+
+        if message['type'] != 'http.response.body':
+            await self.send(message)
+            return
+
+        body, more_body = message.get('body', b''), message.get('more_body', False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start['headers'])
+            if start['status'] == 304:
+                self._revalidated_etag(headers)
+            if not self._compressible(start['status'], headers, body, more_body):
+                await self.send(start)
+                await self.send(message)
+                return
+
+            self.compressor = self.middleware._compressor(self.encoding)
+            headers['Content-Encoding'] = self.encoding
+            if (etag := headers.get('etag')) is not None and etag.endswith('"'):
+                headers['ETag'] = f'{etag[:-1]}-{self.encoding}"'
+
+            if more_body:
+                del headers['Content-Length']
+            else:
+                body = self.compressor.compress(body, final=True)
+                headers['Content-Length'] = str(len(body))
+                await self.send(start)
+                await self.send({'type': 'http.response.body', 'body': body})
+                return
+            await self.send(start)
+
+        if self.compressor is None:
+            await self.send(message)
+            return
+
+        await self.send({'type': 'http.response.body', 'body': self.compressor.compress(body, final=not more_body),
+                         'more_body': more_body})
+
+    def _revalidated_etag(self, headers: MutableHeaders):
+        """
+        Gives the ETag of a 304 the suffix of the encoding when the client revalidates the compressed
+        representation, as the 200 it revalidates had it. Responses below the minimum size were sent with the
+        plain ETag, which is kept
+        """
+        if (etag := headers.get('etag')) is None or not etag.endswith('"'):
+            return
+        if (tagged := f'{etag[:-1]}-{self.encoding}"') in (self.if_none_match or ''):
+            headers['ETag'] = tagged
+
+    def _compressible(self, status: int, headers: MutableHeaders, body: bytes, more_body: bool):
+        if status < 200 or status in (204, 304) or 'content-encoding' in headers:
+            return False
+        if not headers.get('content-type', '').startswith(COMPRESSIBLE_TYPES):
+            return False
+        # the encoding depends on the request headers from here on, even if this response is too small
+        if 'accept-encoding' not in headers.get('vary', '').lower():
+            headers.add_vary_header('Accept-Encoding')
+        return more_body or len(body) >= self.middleware.minimum_size
+
+
+class _Gzip:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class _Brotli:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        return self._compressor.process(data) + (self._compressor.finish() if final else self._compressor.flush())
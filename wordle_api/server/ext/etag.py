@@ -0,0 +1,44 @@
+import hashlib
+
+# suffixes added to the ETag of compressed representations (see `server.ext.compression`)
+ENCODING_SUFFIXES = ('-gzip', '-br')
+
+
+def make_etag(*parts: str) -> str:
+    """
+    Strong ETag of a representation identified by the parts, for example a data version and a canonical query
+
+    Examples
+    --------
+    >>> make_etag('3f2a', 'corpus=web2&wordLength=5')
+    '"7cc9c382a8d9dccae1488f4817a93cc5"'
+    """
+    return '"' + hashlib.sha256('\0'.join(parts).encode()).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether the If-None-Match header matches the ETag. Tags are compared weakly as required for
+    If-None-Match, and the tags of compressed representations match the tag of the uncompressed one
+
+    Examples
+    --------
+    >>> etag_matches('W/"abc", "def-gzip"', '"def"')
+    True
+    >>> etag_matches(None, '"def"')
+    False
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+
+    for tag in if_none_match.split(','):
+        tag = tag.strip().removeprefix('W/')
+        for suffix in ENCODING_SUFFIXES:
+            if tag.endswith(suffix + '"'):
+                tag = tag[:-len(suffix) - 1] + '"'
+                break
+        if tag == etag:
+            return True
+    return False
@@ -0,0 +1,79 @@
+import asyncio
+import time
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable
+
+from fastapi.routing import APIRoute
+from starlette.requests import Request
+
+from server.metrics import REQUEST_SECONDS, STAGE_SECONDS
+
+# [handler start, endpoint start, endpoint end] of the current request
+_timings: ContextVar[list] = ContextVar('timings')
+
+
+class TimedRoute(APIRoute):
+    """
+    Records the latency of every request to the route, split into the 'parse' stage (reading and validating
+    the request up to the endpoint call) and the 'serialize' stage (validating and rendering the response
+    after the endpoint returns)
+    """
+
+    def get_route_handler(self):
+        self.dependant.call = _time_endpoint(self.dependant.call)
+        handler = super().get_route_handler()
+        method = ','.join(sorted(self.methods))
+        route = self.path.rstrip('/') or '/'
+
+        async def timed_handler(request: Request):
+            timings = [time.perf_counter(), None, None]
+            _timings.set(timings)
+            status = 'error'
+            try:
+                response = await handler(request)
+                status = str(response.status_code)
+                return response
+            except Exception as e:
+                # the app's exception handlers decide the status code later on
+                status = type(e).__name__
+                raise
+            finally:
+                end = time.perf_counter()
+                REQUEST_SECONDS.observe(end - timings[0], method, route, status)
+                if timings[1] is not None:
+                    STAGE_SECONDS.observe(timings[1] - timings[0], 'parse')
+                if timings[2] is not None:
+                    STAGE_SECONDS.observe(end - timings[2], 'serialize')
+
+        return timed_handler
+
+
+def _time_endpoint(call: Callable):
+    def start():
+        if (timings := _timings.get(None)) is not None:
+            timings[1] = time.perf_counter()
+        return timings
+
+    def stop(timings: list | None):
+        if timings is not None:
+            timings[2] = time.perf_counter()
+
+    if asyncio.iscoroutinefunction(call):
+        @wraps(call)
+        async def timed(*args, **kwargs):
+            timings = start()
+            try:
+                return await call(*args, **kwargs)
+            finally:
+                stop(timings)
+    else:
+        @wraps(call)
+        def timed(*args, **kwargs):
+            timings = start()
+            try:
+                return call(*args, **kwargs)
+            finally:
+                stop(timings)
+
+    return timed
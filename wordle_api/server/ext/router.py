@@ -3,8 +3,14 @@ from typing import Any, Callable
 from fastapi import APIRouter as FastAPIRouter
 from fastapi.types import DecoratedCallable
 
+from .route import TimedRoute
+
 
 class APIRouter(FastAPIRouter):
+    def __init__(self, **kwargs: Any):
+        kwargs.setdefault('route_class', TimedRoute)
+        super().__init__(**kwargs)
+
     def api_route(self, path: str, *, include_in_schema: bool = True,
                   **kwargs: Any) -> Callable[[DecoratedCallable], DecoratedCallable]:
         if path.endswith("/"):
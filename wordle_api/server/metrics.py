@@ -0,0 +1,205 @@
+"""
+Process-wide metrics exposed on /_metrics in the Prometheus text format (version 0.0.4).
+
+Recording a value takes a lock and a bisect so that metrics can stay on under load. Metrics recorded in process
+pool workers are drained with each task result and merged into the main process (see `server.executor`).
+"""
+import os
+import resource
+import sys
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Iterable
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000)
+
+# (name, type, help, label names, {label values: value}) of metrics computed when scraped
+Family = tuple[str, str, str, tuple[str, ...], dict[tuple, float]]
+
+
+class Metric(ABC):
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        """
+        :param name: metric name
+        :param documentation: help text of the metric
+        :param labelnames: names of the labels. Values are given positionally in the same order when recording
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple, object] = {}
+        self._lock = Lock()
+
+    def drain(self) -> dict[tuple, object]:
+        """Returns the values recorded so far and resets them"""
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    @abstractmethod
+    def merge(self, values: dict[tuple, object]):
+        """Adds values drained from the same metric in another process"""
+
+    @abstractmethod
+    def render(self) -> Iterable[str]:
+        """Sample lines of the metric in the Prometheus text format"""
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def merge(self, values: dict[tuple, float]):
+        for labels, value in values.items():
+            self.inc(value, *labels)
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in values.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (),
+                 buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        """
+        :param name: metric name
+        :param documentation: help text of the metric
+        :param labelnames: names of the labels. Values are given positionally in the same order when recording
+        :param buckets: sorted upper bounds of the buckets. The +Inf bucket is implied
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            if (state := self._values.get(labels)) is None:
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][i] += 1
+            state[1] += value
+
+    @contextmanager
+    def time(self, *labels: str):
+        """Observes the duration of the block in seconds"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *labels)
+
+    def merge(self, values: dict[tuple, list]):
+        with self._lock:
+            for labels, (counts, total) in values.items():
+                if (state := self._values.get(labels)) is None:
+                    state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+                state[0] = [a + b for a, b in zip(state[0], counts)]
+                state[1] += total
+
+    def render(self):
+        with self._lock:
+            values = {labels: (list(counts), total) for labels, (counts, total) in self._values.items()}
+
+        names = (*self.labelnames, 'le')
+        for labels, (counts, total) in values.items():
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(names, (*labels, _format_value(bound)))} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, labels)} {cumulative}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[Metric] = []
+        self._collectors: list[Callable[[], Iterable[Family]]] = []
+
+    def register(self, metric: Metric):
+        self._metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Callable[[], Iterable[Family]]):
+        """Adds a function called on every scrape that returns metric families computed on the spot"""
+        self._collectors.append(collector)
+        return collector
+
+    def drain(self) -> dict[str, dict]:
+        """Returns the values recorded by every metric and resets them. Collectors are not included"""
+        return {m.name: values for m in self._metrics if (values := m.drain())}
+
+    def merge(self, drained: dict[str, dict]):
+        """Adds the values of `drain` from another process"""
+        for m in self._metrics:
+            if (values := drained.get(m.name)) is not None:
+                m.merge(values)
+
+    def render(self) -> str:
+        lines = []
+        for m in self._metrics:
+            lines += [f"# HELP {m.name} {m.documentation}", f"# TYPE {m.name} {m.type}", *m.render()]
+
+        for collector in self._collectors:
+            for name, kind, documentation, labelnames, values in collector():
+                lines += [f"# HELP {name} {documentation}", f"# TYPE {name} {kind}"]
+                lines += [f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}"
+                          for labels, value in values.items()]
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(names: tuple[str, ...], values: tuple) -> str:
+    if not names:
+        return ''
+
+    def escape(value):
+        return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+    return '{' + ','.join(f'{n}="{escape(v)}"' for n, v in zip(names, values)) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def process_memory() -> Iterable[Family]:
+    """Resident and peak resident memory of the current process"""
+    families = []
+    try:
+        with open('/proc/self/statm') as f:
+            rss = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        families.append(('process_resident_memory_bytes', 'gauge', "Resident memory size in bytes", (), {(): rss}))
+    except (OSError, ValueError, IndexError):
+        pass
+
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    families.append(('process_max_resident_memory_bytes', 'gauge', "Peak resident memory size in bytes", (), {(): peak}))
+    return families
+
+
+REGISTRY = Registry()
+REGISTRY.add_collector(process_memory)
+
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    'wordle_request_seconds', "Time spent handling requests by route", ('method', 'route', 'status')))
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    'wordle_stage_seconds', "Time spent in each stage of the requests", ('stage',)))
+CANDIDATES = REGISTRY.register(Histogram(
+    'wordle_candidates', "Number of candidate words matching the hint queries", ('corpus',), SIZE_BUCKETS))
+CORPUS_LOADS = REGISTRY.register(Counter(
+    'wordle_corpus_loads_total', "Number of corpora loaded from disk or built", ('corpus', 'word_length')))
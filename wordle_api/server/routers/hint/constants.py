@@ -1,5 +1,45 @@
-from corpus import CorpusFactory, WordRanker
+import os
 
-WORD_LENGTH = 5
-FACTORY = CorpusFactory(WORD_LENGTH)
-RANKER = WordRanker(WORD_LENGTH, FACTORY.get_word_frequency_table())
+from corpus import CorpusFactory, ResultCache, WordRanker
+from server.metrics import CORPUS_LOADS
+
+# comma separated word lengths served, the first one is the default
+WORD_LENGTHS = [int(n) for n in os.getenv('WORDLE_WORD_LENGTHS', '5').split(',')]
+WORD_LENGTH = WORD_LENGTHS[0]
+# the corpora are built by `CorpusFactory.recreate_data_files`, serving only loads them
+FACTORY = CorpusFactory(WORD_LENGTHS, engine='bitset', build=False,
+                        on_load=lambda source, word_length: CORPUS_LOADS.inc(1, source, str(word_length)))
+# comma separated opening words whose opening books are built with the corpora (see `CorpusFactory.create_opening_books`)
+OPENERS = [w.strip().upper() for w in os.getenv('WORDLE_OPENERS', 'SLATE,CRANE,ADIEU,RAISE,ARISE,STARE,AUDIO,ROATE').split(',') if w.strip()]
+# comma separated corpus sources loaded on startup, '*' loads those the word tables were built with
+PRELOAD = None if (_preload := os.getenv('WORDLE_PRELOAD', '*')) == '*' else [s.strip() for s in _preload.split(',') if s.strip()]
+RANKER = WordRanker(WORD_LENGTH)
+
+
+def _result_size(value) -> int:
+    """
+    Estimated size in bytes of a cached result: the candidate ids and result columns of a hint query or the
+    records of a solve query
+    """
+    if isinstance(value, tuple):
+        # the word, partition and frequency objects of each ranked result and their list slots
+        ids, columns = value
+        return (0 if ids is None else ids.nbytes) + 150 * len(columns['word'])
+    return 500 * len(value)
+
+
+CACHE = ResultCache(maxsize=int(os.getenv('WORDLE_CACHE_SIZE', 1024)),
+                    ttl=float(ttl) if (ttl := os.getenv('WORDLE_CACHE_TTL')) else None,
+                    maxbytes=int(os.getenv('WORDLE_CACHE_BYTES', 256 << 20)),
+                    sizeof=_result_size)
+# candidate ids of hint sessions, per server worker. Tokens are self-contained, so sessions that are not found,
+# for example on another worker, are computed again from their token
+SESSIONS = ResultCache(maxsize=int(os.getenv('WORDLE_SESSION_SIZE', 1024)),
+                       ttl=float(os.getenv('WORDLE_SESSION_TTL', 1800)),
+                       maxbytes=int(os.getenv('WORDLE_SESSION_BYTES', 64 << 20)),
+                       sizeof=lambda ids: 0 if ids is None else ids.nbytes)
+TOKEN_HEADER = 'X-Hint-Token'
+# seconds browsers and proxies may serve a GET hint response without revalidating its ETag
+HINT_MAX_AGE = int(os.getenv('WORDLE_HINT_MAX_AGE', 3600))
+# the solver's feedback matrix grows with the square of the corpus size
+SOLVER_MAX_WORDS = int(os.getenv('WORDLE_SOLVER_MAX_WORDS', 20_000))
@@ -0,0 +1,9 @@
+import os
+
+from server.executor import TaskExecutor
+from .pipeline import init_worker
+
+EXECUTOR = TaskExecutor(backend=os.getenv('WORDLE_EXECUTOR', 'thread'),
+                        workers=int(workers) if (workers := os.getenv('WORDLE_EXECUTOR_WORKERS')) else None,
+                        max_pending=int(os.getenv('WORDLE_MAX_PENDING', 64)),
+                        initializer=init_worker)
@@ -1,34 +1,165 @@
-from pydantic import conint, constr, validator
+from typing import Literal
+from urllib.parse import quote
+
+from pydantic import conint, conlist, constr, root_validator, validator
 
 from server.ext import CamelModel
-from .constants import FACTORY, WORD_LENGTH
+from .constants import FACTORY, WORD_LENGTH, WORD_LENGTHS
+
+MAX_WORD_LENGTH = max(WORD_LENGTHS)
 
 Letter = constr(regex=r'^[a-zA-Z]$', strip_whitespace=True)
-Position = conint(ge=1, le=WORD_LENGTH)
+Position = conint(ge=1, le=MAX_WORD_LENGTH)
+
+
+def encode_filter(canonical: tuple) -> str:
+    """
+    Query string form of a letter filter given as `WordFilter.canonical`, that is
+    `letter.positions.exclude_positions.at_least.at_most` where positions are joined by '_'
+
+    Examples
+    --------
+    >>> encode_filter(('a', (1, 3), (2,), 1, 5))
+    'a.1_3.2.1.5'
+    """
+    letter, positions, exclude_positions, at_least, at_most = canonical
+    return f"{letter}.{'_'.join(map(str, positions))}.{'_'.join(map(str, exclude_positions))}.{at_least}.{at_most}"
+
+
+def decode_filter(text: str) -> tuple[str, list[int], list[int], int, int]:
+    """Parses a letter filter encoded by `encode_filter`. Raises ValueError if it is malformed"""
+    letter, positions, exclude_positions, at_least, at_most = text.split('.')
+    return (letter,
+            [int(p) for p in positions.split('_') if p],
+            [int(p) for p in exclude_positions.split('_') if p],
+            int(at_least),
+            int(at_most))
 
 
 class LetterDesc(CamelModel):
     letter: Letter
-    positions: list[conint(ge=1)]
-    exclude_positions: list[conint(ge=1)]
-    at_least: conint(ge=0, le=WORD_LENGTH)
-    at_most: conint(ge=0, le=WORD_LENGTH)
+    positions: list[Position]
+    exclude_positions: list[Position]
+    at_least: conint(ge=0, le=MAX_WORD_LENGTH)
+    at_most: conint(ge=0, le=MAX_WORD_LENGTH)
 
 
 class HintQuery(CamelModel):
     query: list[LetterDesc]
     corpus: str
     limit: conint(ge=1) = None
+    token: str = None
+    word_length: int = WORD_LENGTH
+    # 'columns' returns {"word": [...], "partition": [...], "frequency": [...]} instead of a list of records
+    format: Literal['records', 'columns'] = 'records'
+
+    @classmethod
+    def from_params(cls, corpus: str, filters: list[str], word_length: int = WORD_LENGTH, limit: int = None,
+                    format: str = 'records'):
+        """
+        Creates the query from the parameters of a query string. Each filter is encoded as
+        `letter.positions.exclude_positions.at_least.at_most` where positions are joined by '_',
+        for example 'a.1_3.2.1.5' or 'x...0.0' for a letter that is not in the word
+        """
+        query = []
+        for f in filters:
+            try:
+                letter, positions, exclude_positions, at_least, at_most = decode_filter(f)
+            except ValueError:
+                raise ValueError(f"invalid filter: '{f}'. Use letter.positions.exclude_positions.at_least.at_most "
+                                 f"where positions are joined by '_', for example 'a.1_3.2.1.5'") from None
+            query.append({'letter': letter, 'positions': positions, 'exclude_positions': exclude_positions,
+                          'at_least': at_least, 'at_most': at_most})
+
+        return cls(corpus=corpus, query=query, word_length=word_length, limit=limit, format=format)
+
+    def canonical_query(self) -> str:
+        """
+        Query string of the query (see `HintQuery.from_params`) which is the same for queries that only differ
+        in the order of their letters or positions, so that HTTP caches store each query once. Parameters
+        with their default value are left out
+
+        Examples
+        --------
+        >>> HintQuery(corpus='web2 | coca', limit=10, query=[
+        ...     {'letter': 'S', 'positions': [], 'exclude_positions': [], 'at_least': 0, 'at_most': 0},
+        ...     {'letter': 'a', 'positions': [3, 1], 'exclude_positions': [2], 'at_least': 1, 'at_most': 5},
+        ... ]).canonical_query()
+        'corpus=coca%7Cweb2&limit=10&q=a.1_3.2.1.5&q=s...0.0'
+        """
+        filters = sorted((x.letter.lower(), tuple(sorted(set(x.positions))), tuple(sorted(set(x.exclude_positions))),
+                          x.at_least, x.at_most) for x in self.query)
+        params = [f"corpus={quote(self.corpus, safe='')}"]
+        if self.word_length != WORD_LENGTH:
+            params.append(f"wordLength={self.word_length}")
+        if self.limit is not None:
+            params.append(f"limit={self.limit}")
+        if self.format != 'records':
+            params.append(f"format={self.format}")
+        params += [f"q={encode_filter(f)}" for f in filters]
+        return '&'.join(params)
 
     @validator('corpus')
     def validate_corpus(cls, corpus: str):
         sources = FACTORY.sources
-        if corpus not in sources:
-            raise ValueError(f"Invalid corpus: {corpus}. Use one of {sources}]")
-        return corpus
+        if not all(s in sources for s in FACTORY.split_source(corpus)[0]):
+            raise ValueError(f"Invalid corpus: {corpus}. Use one of {sources}, "
+                             f"or combine them with '|' for their union or '&' for their intersection")
+        # every spelling of a combination shares its corpus, cache entries and canonical query
+        return FACTORY.canonical_source(corpus)
+
+    @validator('word_length')
+    def validate_word_length(cls, word_length: int):
+        if word_length not in WORD_LENGTHS:
+            raise ValueError(f"Invalid word length: {word_length}. Use one of {WORD_LENGTHS}")
+        return word_length
+
+    @root_validator(skip_on_failure=True)
+    def validate_query_word_length(cls, values: dict):
+        word_length = values['word_length']
+        for x in values['query']:
+            if max([*x.positions, *x.exclude_positions, x.at_least, x.at_most]) > word_length:
+                raise ValueError(f"letter '{x.letter}' positions and counts must be at most the word length: {word_length}")
+        return values
+
+
+class BatchHintQuery(CamelModel):
+    queries: conlist(HintQuery, min_items=1, max_items=10_000)
+
+    @validator('queries')
+    def validate_no_tokens(cls, queries: list[HintQuery]):
+        if any(q.token is not None for q in queries):
+            raise ValueError("session tokens are not supported in batch queries")
+        return queries
+
+
+class SolveQuery(CamelModel):
+    query: list[LetterDesc]
+    corpus: str
+    limit: conint(ge=1, le=1000) = 10
+    method: Literal['entropy', 'minimax'] = 'entropy'
+    word_length: int = WORD_LENGTH
+
+    _validate_corpus = validator('corpus', allow_reuse=True)(HintQuery.validate_corpus.__func__)
+    _validate_word_length = validator('word_length', allow_reuse=True)(HintQuery.validate_word_length.__func__)
+    _validate_query_word_length = root_validator(skip_on_failure=True, allow_reuse=True)(
+        HintQuery.validate_query_word_length.__func__)
+
+
+class SolveResult(CamelModel):
+    word: str
+    entropy: float
+    max_bucket: int
+    candidate: bool
 
 
 class HintResult(CamelModel):
     word: str
     partition: int
     frequency: int
+
+
+class HintColumns(CamelModel):
+    word: list[str]
+    partition: list[int]
+    frequency: list[int]
@@ -0,0 +1,141 @@
+import numpy as np
+
+from corpus import WordFilter
+from corpus.solver import best_guesses
+from server.metrics import CANDIDATES, STAGE_SECONDS
+from .constants import FACTORY, PRELOAD, RANKER, SOLVER_MAX_WORDS
+
+
+def compute_hints(source: str, word_length: int, filters: list[WordFilter], limit: int | None,
+                  previous: np.ndarray = None, version: str = None, session: list[WordFilter] = None):
+    """
+    Filters and ranks the corpus. Runs on the hint executor, so it must stay a picklable module-level function
+
+    :param source: corpus source
+    :param word_length: word length of the corpus
+    :param filters: filters to apply
+    :param limit: number of ranked results to return
+    :param previous: candidate ids of an earlier query to narrow instead of filtering the whole corpus
+    :param version: data version the previous ids were computed from
+    :param session: the filters of the earlier query with the new filters, applied to the whole corpus instead
+        of narrowing the previous ids when the corpus is not of that version anymore
+    :return: the candidate ids, or None if every word is a candidate, and the columns of the ranked results
+    """
+    with STAGE_SECONDS.time('get_corpus'):
+        corpus = FACTORY.get_corpus(source, word_length)
+
+    with STAGE_SECONDS.time('filter'):
+        if session is not None and corpus.version != version:
+            # the data was reloaded since the previous ids were computed, their word ids may have changed
+            ids = corpus.get_potential_word_ids(session)
+        elif previous is None:
+            ids = corpus.get_potential_word_ids(filters)
+        else:
+            ids = corpus.narrow_word_ids(previous, filters)
+    CANDIDATES.observe(len(ids), source)
+
+    with STAGE_SECONDS.time('rank'):
+        results = RANKER.rank_columns(corpus, ids, limit)
+
+    return ids if len(ids) < len(corpus) else None, results
+
+
+def opening_hints(source: str, word_length: int, filters: list[WordFilter], limit: int | None):
+    """
+    Looks the query up in the corpus' opening book. Cheap enough to run on the event loop
+
+    :return: the candidate ids, or None if every word is a candidate, and the columns of the ranked results.
+        None if the filters are not the state after one of the book's openers
+    """
+    with STAGE_SECONDS.time('book'):
+        if (book := FACTORY.get_opening_book(source, word_length)) is None or (found := book.lookup(filters)) is None:
+            return None
+
+        corpus = FACTORY.get_corpus(source, word_length)
+        ranked, partition = found
+        CANDIDATES.observe(len(ranked), source)
+        top = ranked[:limit]
+        results = {'word': corpus.index.words_of(top),
+                   'partition': partition[:limit].tolist(),
+                   'frequency': corpus.frequency[top].tolist()}
+        return np.sort(ranked).astype(np.int64) if len(ranked) < len(corpus) else None, results
+
+
+def compute_hint_batch(source: str, word_length: int, queries: list[tuple[int, list[WordFilter], int | None]]):
+    """
+    Filters and ranks many queries against one corpus. Queries are visited in the order of their sorted
+    canonical filters so that queries sharing a filter prefix narrow the candidates of that prefix instead of
+    starting from the whole corpus
+
+    :param source: corpus source
+    :param word_length: word length of the corpus
+    :param queries: (index, filters, limit) of each query
+    :return: (index, results, error) of each query where either the result columns or error is None
+    """
+    with STAGE_SECONDS.time('get_corpus'):
+        corpus = FACTORY.get_corpus(source, word_length)
+    everything = corpus.get_potential_word_ids([])
+
+    # canonical filters applied so far and the candidates after each of them
+    path: list[tuple[tuple, np.ndarray]] = []
+    output = []
+
+    for key, i, limit in sorted((tuple(sorted(f.canonical() for f in filters)), i, limit) for i, filters, limit in queries):
+        depth = 0
+        while depth < min(len(path), len(key)) and path[depth][0] == key[depth]:
+            depth += 1
+        del path[depth:]
+
+        try:
+            with STAGE_SECONDS.time('filter'):
+                for canonical in key[depth:]:
+                    ids = path[-1][1] if path else everything
+                    path.append((canonical, corpus.narrow_word_ids(ids, [WordFilter.from_canonical(canonical)])))
+
+            ids = path[-1][1] if path else everything
+            CANDIDATES.observe(len(ids), source)
+            with STAGE_SECONDS.time('rank'):
+                output.append((i, RANKER.rank_columns(corpus, ids, limit), None))
+        except ValueError as e:
+            output.append((i, None, str(e)))
+
+    return output
+
+
+def compute_best_guesses(source: str, word_length: int, filters: list[WordFilter], limit: int, method: str):
+    """
+    Finds the guesses that best split the candidates of the filters
+
+    :return: records of the best guesses
+    """
+    with STAGE_SECONDS.time('get_corpus'):
+        corpus = FACTORY.get_corpus(source, word_length)
+    with STAGE_SECONDS.time('feedback_matrix'):
+        # the matrices are built with the corpora, see `CorpusFactory.create_feedback_matrices`
+        matrix = FACTORY.get_feedback_matrix(source, word_length, SOLVER_MAX_WORDS, compute=False)
+
+    with STAGE_SECONDS.time('filter'):
+        candidates = corpus.get_potential_word_ids(filters)
+    CANDIDATES.observe(len(candidates), source)
+
+    with STAGE_SECONDS.time('solve'):
+        # the matrix only covers the words of the corpus, in the order of their ids in the shared word table
+        rows, entropy, max_bucket = best_guesses(matrix, np.searchsorted(corpus.word_ids, candidates), limit, method,
+                                                 3 ** word_length)
+        ids = corpus.word_ids[rows]
+    is_candidate = np.isin(ids, candidates)
+    return [{'word': w, 'entropy': e, 'max_bucket': b, 'candidate': c}
+            for w, e, b, c in zip(corpus.index.words_of(ids), entropy.tolist(), max_bucket.tolist(), is_candidate.tolist())]
+
+
+def hint_content(columns: dict[str, list], format: str):
+    """Content of a hint response in the requested format, 'records' or 'columns'"""
+    if format == 'columns':
+        return columns
+    return [{'word': w, 'partition': p, 'frequency': f}
+            for w, p, f in zip(columns['word'], columns['partition'], columns['frequency'])]
+
+
+def init_worker():
+    """Preloads the corpora in each process pool worker"""
+    FACTORY.preload(PRELOAD)
@@ -1,24 +1,215 @@
+import base64
+import logging
+from collections import defaultdict
+
+from fastapi import Query, Request, Response
+from fastapi.responses import RedirectResponse, StreamingResponse
+
 from corpus import WordFilter
-from server.ext import APIRouter
+from server.executor import ExecutorSaturated
+from server.ext import APIRouter, FastJSONResponse, dumps, etag_matches, make_etag
+from server.metrics import REGISTRY
 from . import models
-from .constants import FACTORY, RANKER
+from .constants import CACHE, FACTORY, HINT_MAX_AGE, SESSIONS, TOKEN_HEADER, WORD_LENGTH
+from .executor import EXECUTOR
+from .pipeline import compute_best_guesses, compute_hint_batch, compute_hints, hint_content, opening_hints
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=['Hint'])
 
+# version of the session token format
+TOKEN_PREFIX = '1.'
+# longer than the token of a filter for every letter
+MAX_TOKEN_LENGTH = 4096
+
+
+@REGISTRY.add_collector
+def collect_metrics():
+    """Statistics of the hint caches and executor, read when the metrics are scraped"""
+    caches = {('hints',): CACHE.stats(), ('sessions',): SESSIONS.stats()}
+    for stat, kind in (('hits', 'counter'), ('misses', 'counter'), ('evictions', 'counter'),
+                       ('expirations', 'counter'), ('size', 'gauge'), ('bytes', 'gauge')):
+        name = f"wordle_cache_{stat}{'_total' if kind == 'counter' else ''}"
+        yield name, kind, f"Hint cache {stat}", ('cache',), {k: v[stat] for k, v in caches.items()}
 
-@router.post("/", response_model=list[models.HintResult])
+    yield 'wordle_executor_pending', 'gauge', "Tasks running or queued on the hint executor", (), {(): EXECUTOR.pending}
+
+
+@router.post("/", response_model=list[models.HintResult] | models.HintColumns)
 async def get_hints(query: models.HintQuery):
-    corpus = FACTORY.get_corpus(query.corpus)
+    """
+    Gets the ranked hints for the query. The response carries a session token in the X-Hint-Token header.
+    Sending the token back with only the new letter constraints narrows the previous candidates instead of
+    filtering the whole corpus again. The token holds the filters of the session, so a session whose
+    candidates are not in this worker's cache is computed again from them
+
+    The hints are a list of records, or their columns if the query's format is 'columns'. They are encoded
+    directly instead of being validated against the response model
+    """
     filters = [WordFilter(x.letter, x.positions, x.exclude_positions, x.at_least, x.at_most) for x in query.query]
-    words = corpus.get_potential_words(filters)
-    results = RANKER.partition_score(words)
+    # results and sessions are only valid for the build of the data they were computed from
+    version = FACTORY.data_version(query.word_length)
+
+    if query.token is None:
+        session = filters
+        ids, results = await cached_hints(query, filters, version)
+    else:
+        session = session_filters(query.token) + filters
+        found, previous = SESSIONS.get((query.corpus, query.word_length, version, query.token))
+        if found:
+            ids, results = await EXECUTOR.run(compute_hints, query.corpus, query.word_length, filters, query.limit,
+                                              previous, version, session)
+        else:
+            # started on another worker, evicted or computed from data that was since reloaded
+            ids, results = await cached_hints(query, session, version)
+
+    # ids is None when every word is a candidate which keeps sessions for fresh games small
+    token = session_token(session)
+    SESSIONS.set((query.corpus, query.word_length, version, token), ids)
 
-    if isinstance(query.limit, int):
-        results = results.head(query.limit)
+    return FastJSONResponse(hint_content(results, query.format), headers={TOKEN_HEADER: token})
 
-    return results.to_dict('records')
+
+def session_token(filters: list[WordFilter]) -> str:
+    """
+    Token of a hint session with the filters. It encodes the canonical filters, so that any worker can compute
+    the session's candidates again. It is not signed as it holds nothing a client could not send in a query
+    """
+    text = '~'.join(models.encode_filter(f) for f in sorted({f.canonical() for f in filters}))
+    return TOKEN_PREFIX + base64.urlsafe_b64encode(text.encode()).decode().rstrip('=')
+
+
+def session_filters(token: str) -> list[WordFilter]:
+    """The filters of a token made by `session_token`"""
+    try:
+        if not token.startswith(TOKEN_PREFIX) or len(token) > MAX_TOKEN_LENGTH:
+            raise ValueError
+        data = token[len(TOKEN_PREFIX):]
+        text = base64.b64decode(data + '=' * (-len(data) % 4), altchars=b'-_', validate=True).decode()
+        filters = [WordFilter(*models.decode_filter(f)) for f in text.split('~') if f]
+    except ValueError:
+        raise ValueError("hint session token is invalid. Resend the full query without a token") from None
+
+    if not all(len(f.letter) == 1 and f.letter.isalpha() for f in filters):
+        raise ValueError("hint session token is invalid. Resend the full query without a token")
+    return filters
+
+
+@router.get("/", response_model=list[models.HintResult] | models.HintColumns)
+async def get_cacheable_hints(request: Request,
+                              corpus: str,
+                              q: list[str] = Query([]),
+                              word_length: int = Query(WORD_LENGTH, alias='wordLength'),
+                              limit: int = None,
+                              format: str = 'records'):
+    """
+    Gets the ranked hints of a query given as a query string, such as
+    `?corpus=web2&limit=20&q=a.1_3.2.1.5&q=s...0.0` where each `q` is a letter filter (see
+    `HintQuery.from_params`). Browsers and proxies can cache these responses: queries are redirected to
+    their canonical query string and responses carry an ETag of the corpus data version and the query,
+    which is answered with 304 Not Modified when it matches. Sessions are not supported
+    """
+    query = models.HintQuery.from_params(corpus, q, word_length, limit, format)
+    canonical = query.canonical_query()
+    headers = {'Cache-Control': f"public, max-age={HINT_MAX_AGE}", 'Vary': 'Accept-Encoding'}
+    if request.url.query != canonical:
+        return RedirectResponse(f"{request.url.path}?{canonical}", status_code=308, headers=headers)
+
+    # the version is None until the corpus data is loaded, in which case the hints are computed first
+    if (version := FACTORY.data_version(query.word_length)) is not None:
+        headers['ETag'] = make_etag(version, canonical)
+        if etag_matches(request.headers.get('If-None-Match'), headers['ETag']):
+            return Response(status_code=304, headers=headers)
+
+    filters = [WordFilter(x.letter, x.positions, x.exclude_positions, x.at_least, x.at_most) for x in query.query]
+    _, results = await cached_hints(query, filters, version)
+    if version is None and (version := FACTORY.data_version(query.word_length)) is not None:
+        headers['ETag'] = make_etag(version, canonical)
+
+    return FastJSONResponse(hint_content(results, query.format), headers=headers)
+
+
+async def cached_hints(query: models.HintQuery, filters: list[WordFilter], version: str | None):
+    """
+    Candidate ids and ranked hints of a query without session, from the cache if it was seen before or from
+    the opening book if it is the state after one of the openers
+    """
+    key = CACHE.make_key(query.corpus, filters, query.limit, query.word_length, version)
+    found, value = CACHE.get(key)
+    if found:
+        return value
+
+    # the book is only read once the corpus data is loaded, so that the event loop never waits for a load
+    if version is not None and (value := opening_hints(query.corpus, query.word_length, filters, query.limit)) is not None:
+        return value
+
+    value = await EXECUTOR.run(compute_hints, query.corpus, query.word_length, filters, query.limit)
+    CACHE.set(key, value)
+    return value
+
+
+@router.post("/batch")
+async def get_hints_batch(batch: models.BatchHintQuery):
+    """
+    Gets the ranked hints of many queries. Results are streamed back as NDJSON, one line per query in the
+    form {"index": ..., "hints": [...]} or {"index": ..., "error": "..."} where index is the position of the
+    query in the batch. Lines are not in the order of the queries. The hints follow the format of each query
+    """
+    groups: dict[tuple[str, int], list] = defaultdict(list)
+    for i, q in enumerate(batch.queries):
+        filters = [WordFilter(x.letter, x.positions, x.exclude_positions, x.at_least, x.at_most) for x in q.query]
+        groups[q.corpus, q.word_length].append((i, filters, q.limit))
+
+    ((source, word_length), queries), *others = groups.items()
+    # the first group runs before the response starts so that its errors, such as a saturated executor, are
+    # answered by the error handlers instead of breaking a response that was already sent as successful
+    output = await EXECUTOR.run(compute_hint_batch, source, word_length, queries)
+
+    def encode(results: list):
+        return b''.join(dumps({'index': i, 'hints': hint_content(columns, batch.queries[i].format)}
+                              if error is None else {'index': i, 'error': error}) + b'\n'
+                        for i, columns, error in results)
+
+    async def stream():
+        yield encode(output)
+        for (source, word_length), queries in others:
+            try:
+                results = await EXECUTOR.run(compute_hint_batch, source, word_length, queries)
+            except (ValueError, ExecutorSaturated) as e:
+                results = [(i, None, str(e)) for i, _, _ in queries]
+            except Exception:
+                # the status was already sent, the failure is reported on the lines of the group's queries
+                logger.exception("batch hint group of '%s' with word length %d failed", source, word_length)
+                results = [(i, None, "internal server error") for i, _, _ in queries]
+            yield encode(results)
+
+    return StreamingResponse(stream(), media_type='application/x-ndjson')
+
+
+@router.post("/solve", response_model=list[models.SolveResult])
+async def get_best_guesses(query: models.SolveQuery):
+    """
+    Gets the guesses that best split the remaining candidates, either by the expected information of their
+    feedback (entropy) or by the size of their largest feedback bucket (minimax)
+    """
+    filters = [WordFilter(x.letter, x.positions, x.exclude_positions, x.at_least, x.at_most) for x in query.query]
+
+    key = CACHE.make_key(query.corpus, filters, query.limit, query.word_length, 'solve', query.method,
+                         FACTORY.data_version(query.word_length))
+    found, results = CACHE.get(key)
+    if not found:
+        results = await EXECUTOR.run(compute_best_guesses, query.corpus, query.word_length, filters, query.limit, query.method)
+        CACHE.set(key, results)
+
+    return results
 
 
 @router.get('/corpus', response_model=list[str])
 async def get_corpus():
     return FACTORY.sources
+
+
+@router.get('/word-lengths', response_model=list[int])
+async def get_word_lengths():
+    return FACTORY.word_lengths
@@ -1,5 +0,0 @@
-from pathlib import Path
-
-
-def project_root():
-    return Path(__file__).parents[1]